@@ -0,0 +1,602 @@
+import os, re, sys, json, time, random, shutil, resource, statistics, argparse, tempfile, threading, subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urljoin
+from bs4 import BeautifulSoup
+
+import playwright_scrape_etmoc as etmoc
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "etmoc_output")
+PRODUCT_FIXTURE = os.path.join(FIXTURE_DIR, "debug_product_3595.html")
+CATALOG_FIXTURE = os.path.join(FIXTURE_DIR, "debug_brands.html")
+IMAGE_FIXTURE_DIR = os.path.join(FIXTURE_DIR, "images")
+PRODUCT_URL = f"{etmoc.BASE}/Firms/Product?Id=3595"
+CATALOG_URL = f"{etmoc.BASE}/Firms/Brands?page=1"
+
+
+def read_fixture(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def time_ms(fn, repeat: int) -> float:
+    """多次运行取中位数耗时（毫秒）。"""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+# 基线提取器：引入解析后端与局部解析之前 `build_item_from_soup` 及其辅助函数的冻结副本，
+# 基线行计时这份原始实现，不随主模块的优化变化；只改动选择器常量的引用方式
+BASELINE_SELECTORS = {
+    "catalog_left_col": "body > div.container > div.row > div.col-8",
+    "product_title": "div.brand-title > h2",
+    "image": "div.proImg img[src]",
+    "pro_bar": "div.proBars div.proBar",
+}
+
+
+def baseline_text_clean(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or "")).strip()
+
+
+def baseline_parse_images(soup: BeautifulSoup, page_url: str) -> list:
+    img = soup.select_one(BASELINE_SELECTORS["image"])
+    if not img:
+        return []
+    src = img.get("src")
+    if not src:
+        return []
+    return [urljoin(page_url, src)]
+
+
+def baseline_clean_time_value(v: str) -> str:
+    v = baseline_text_clean(v)
+    if not v:
+        return v
+    m = re.search(r"(20\d{2}\s*年(?:\s*\d{1,2}\s*月)?(?:\s*\d{1,2}\s*日)?)", v)
+    if m:
+        return baseline_text_clean(m.group(1))
+    m2 = re.search(r"(20\d{2})", v)
+    if m2:
+        return baseline_text_clean(m2.group(1) + " 年")
+    v2 = re.split(
+        r"(在线评分|同品牌产品|真伪鉴别|首页|关于我们|免责声明|用户协议|站点地图|版权所有)",
+        v,
+    )[0]
+    return baseline_text_clean(v2)
+
+
+def baseline_clean_info_values(info: dict) -> dict:
+    cleaned = dict(info)
+    for key in ["上市时间", "发行时间"]:
+        if key in cleaned and cleaned[key]:
+            cleaned[key] = baseline_clean_time_value(cleaned[key])
+    return cleaned
+
+
+def baseline_parse_product_names(soup: BeautifulSoup, title_text: str = "") -> dict:
+    h2 = soup.select_one(BASELINE_SELECTORS["product_title"])
+    out = {}
+    if h2:
+        zh = baseline_text_clean(h2.get_text(" "))
+        sm = h2.select_one("small")
+        if sm:
+            en = baseline_text_clean(sm.get_text(" "))
+            zh = baseline_text_clean(zh.replace(en, ""))
+            out["中文品名"] = zh
+            out["英文品名"] = en
+            return out
+        if zh:
+            out["中文品名"] = zh
+    return out
+
+
+def baseline_extract_info(soup: BeautifulSoup) -> dict:
+    info: dict = {}
+
+    h2 = soup.select_one(BASELINE_SELECTORS["product_title"])
+    title_text = (
+        baseline_text_clean(h2.get_text(" "))
+        if h2
+        else baseline_text_clean((soup.title.string if soup.title else "") or "")
+    )
+    info.update(baseline_parse_product_names(soup, title_text))
+
+    root = soup.select_one(BASELINE_SELECTORS["catalog_left_col"]) or soup
+    for bar in root.select(BASELINE_SELECTORS["pro_bar"]):
+        children = bar.find_all("div", recursive=False)
+        targets = children if children else [bar]
+        for sub in targets:
+            lab = sub.select_one("span")
+            if not lab:
+                continue
+            key = baseline_text_clean(lab.get_text()).strip("：:")
+            lab.extract()
+            val = baseline_text_clean(sub.get_text(" "))
+            if val:
+                info[key] = val
+
+    return baseline_clean_info_values(info)
+
+
+def baseline_get_title_from_soup(soup: BeautifulSoup) -> str:
+    h2 = soup.select_one(BASELINE_SELECTORS["product_title"])
+    return (
+        baseline_text_clean(h2.get_text(" "))
+        if h2
+        else baseline_text_clean((soup.title.string if soup.title else "") or "")
+    )
+
+
+def baseline_build_item_from_soup(soup: BeautifulSoup, page_url: str) -> dict:
+    title = baseline_get_title_from_soup(soup)
+    values = baseline_extract_info(soup)
+    images = baseline_parse_images(soup, page_url)
+    return {"title": title, "url": page_url, "info": values, "images": images}
+
+
+def parse_variants() -> list[tuple[str, str, bool]]:
+    """(标签, 后端, 是否局部解析)；未安装 lxml 时跳过 lxml 组合。"""
+    backends = ["html.parser"] + (["lxml"] if etmoc.HAS_LXML else [])
+    return [
+        (f"{b}{' + scoped' if scoped else ''}", b, scoped)
+        for b in backends
+        for scoped in (False, True)
+    ]
+
+
+def bench_parsers(repeat: int = 50) -> list[dict]:
+    """对比基线（html.parser 整页 + 冻结的原始提取器）与各解析后端/局部解析组合的单页解析耗时，
+    并校验详情条目与目录链接输出与基线一致。
+    """
+    product_html = read_fixture(PRODUCT_FIXTURE)
+    catalog_html = read_fixture(CATALOG_FIXTURE)
+
+    def baseline_product():
+        soup = BeautifulSoup(product_html, "html.parser")
+        return baseline_build_item_from_soup(soup, PRODUCT_URL)
+
+    def baseline_catalog():
+        soup = BeautifulSoup(catalog_html, "html.parser")
+        anchors = soup.select(etmoc.SELECTORS["product_links_in_catalog"])
+        return etmoc.to_abs(CATALOG_URL, [a["href"] for a in anchors])
+
+    expected_item = baseline_product()
+    expected_links = baseline_catalog()
+    rows = [
+        {
+            "variant": "baseline (html.parser)",
+            "product_ms": time_ms(baseline_product, repeat),
+            "catalog_ms": time_ms(baseline_catalog, repeat),
+            "same_output": True,
+        }
+    ]
+    saved = dict(etmoc.PARSER)
+    try:
+        for label, backend, scoped in parse_variants():
+            etmoc.PARSER.update({"backend": backend, "scoped": scoped})
+
+            def product():
+                soup = etmoc.make_product_soup(product_html)
+                return etmoc.build_item_from_soup(soup, PRODUCT_URL)
+
+            def catalog():
+                soup = etmoc.make_soup(catalog_html, "catalog")
+                anchors = etmoc.select_catalog_anchors(soup)
+                return etmoc.to_abs(CATALOG_URL, [a["href"] for a in anchors])
+
+            rows.append(
+                {
+                    "variant": label,
+                    "product_ms": time_ms(product, repeat),
+                    "catalog_ms": time_ms(catalog, repeat),
+                    "same_output": product() == expected_item
+                    and catalog() == expected_links,
+                }
+            )
+    finally:
+        etmoc.PARSER.update(saved)
+    return rows
+
+
+def print_parser_report(rows: list[dict]):
+    base = rows[0]
+    print(f"{'解析方式':<28}{'详情页 ms':>12}{'目录页 ms':>12}{'条/秒':>10}{'加速':>8}  输出一致")
+    for r in rows:
+        speedup = base["product_ms"] / r["product_ms"] if r["product_ms"] else 0.0
+        items_per_s = 1000 / r["product_ms"] if r["product_ms"] else 0.0
+        print(
+            f"{r['variant']:<28}{r['product_ms']:>12.2f}{r['catalog_ms']:>12.2f}"
+            f"{items_per_s:>10.0f}{speedup:>7.1f}x  {'是' if r['same_output'] else '否'}"
+        )
+
+
+# 本地夹具站点：以录制的目录页/详情页为模板生成任意规模的目录、品牌大全、品牌页与详情页，
+# 可注入延迟与错误，抓取流程通过替换 `etmoc.BASE` 指向本站点
+class FixtureSite:
+    """按参数生成页面内容（结果确定，不同模式的输出可直接比对）。
+    - 目录 `/Firms/Brands?page=N`：共 `pages` 页、每页 `per_page` 个产品，Id 自 `top_id` 递减。
+    - 品牌大全 `/Firms/BrandAll` 与品牌页 `/Firms/BrandShow?Id=B`：`brands` 个品牌、每个 `per_brand` 个产品。
+      （没有录制的品牌页，按站点的链接格式合成）
+    - 详情 `/Firms/Product?Id=N`：详情模板替换品名、条码与图片路径；图片 `/firm/...` 返回录制的图片字节。
+    - 页面与图片请求先等待 `latency_ms`（按 `jitter` 比例抖动），再以 `error_rate` 概率返回 503。
+    """
+
+    def __init__(
+        self,
+        pages: int = 5,
+        per_page: int = 10,
+        brands: int = 5,
+        per_brand: int = 10,
+        top_id: int = 5000,
+        latency_ms: float = 50.0,
+        jitter: float = 0.5,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.pages = pages
+        self.per_page = per_page
+        self.brands = brands
+        self.per_brand = per_brand
+        self.top_id = top_id
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"pages": 0, "images": 0, "static": 0, "errors": 0}
+        self.catalog_template = strip_external_scripts(read_fixture(CATALOG_FIXTURE))
+        self.product_template = strip_external_scripts(read_fixture(PRODUCT_FIXTURE))
+        m = re.search(r'(<ul class="detail list-p">)(.*?)(</ul>)', self.catalog_template, re.S)
+        self._list_span = m.span(2)
+        self._item_template = re.search(r"<li>.*?</li>", m.group(2), re.S).group(0)
+        images = sorted(os.listdir(IMAGE_FIXTURE_DIR)) if os.path.isdir(IMAGE_FIXTURE_DIR) else []
+        self.image_bytes = b""
+        if images:
+            with open(os.path.join(IMAGE_FIXTURE_DIR, images[0]), "rb") as f:
+                self.image_bytes = f.read()
+
+    def take_counters(self) -> dict:
+        with self._lock:
+            out = dict(self.counters)
+            for k in self.counters:
+                self.counters[k] = 0
+        return out
+
+    def count(self, kind: str):
+        with self._lock:
+            self.counters[kind] += 1
+
+    def delay_and_fail(self) -> bool:
+        """注入延迟；返回本次是否应以 503 失败。"""
+        with self._lock:
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+            fail = self._rng.random() < self.error_rate
+        if self.latency_ms > 0:
+            time.sleep(max(0.0, self.latency_ms * factor) / 1000)
+        return fail
+
+    def catalog_ids(self, page: int) -> list[int]:
+        first = self.top_id - (page - 1) * self.per_page
+        return [first - k for k in range(self.per_page)]
+
+    def brand_ids(self, brand: int) -> list[int]:
+        first = self.top_id - (brand - 1) * self.per_brand
+        return [first - k for k in range(self.per_brand)]
+
+    def catalog_page(self, page: int) -> str:
+        items = []
+        for pid in self.catalog_ids(page):
+            it = re.sub(r"Product\?Id=\d+", f"Product?Id={pid}", self._item_template)
+            it = it.replace("/firm/2025/202510132047511970.jpg", f"/firm/bench/{pid}.jpg")
+            items.append(it.replace("双喜（春天幻影）", f"双喜（基准{pid}）"))
+        start, end = self._list_span
+        html = self.catalog_template[:start] + "\n" + "\n".join(items) + "\n" + self.catalog_template[end:]
+        # 左列上一页/下一页与底部分页（第 12 个 li 为末页锚点，与站点一致）
+        next_li = f'<li><a href="?page={page + 1}">下一页</a></li>' if page < self.pages else "<li>下一页</li>"
+        html = html.replace('<li><a href="?page=2">下一页</a></li></ul>\n    </div>', next_li + "</ul>\n    </div>", 1)
+        nums = "".join(
+            f'<li class="active"><span>{n}</span></li>' if n == page else f'<li><a href="?page={n}">{n}</a></li>'
+            for n in range(1, min(self.pages, 10) + 1)
+        )
+        last = f'<li><a href="?page={self.pages}">...{self.pages}</a></li>' if self.pages > 10 else ""
+        nav = f'<nav><ul class="pagination"><li class="disabled"><span>上一页</span></li>{nums}{last}{next_li}</ul></nav>'
+        return re.sub(r'<nav><ul class="pagination">.*?</ul></nav>', lambda _: nav, html, count=1, flags=re.S)
+
+    def product_page(self, pid: int) -> str:
+        html = self.product_template.replace("新圣境", f"基准{pid}")
+        html = html.replace("6901028097789", f"69{pid:011d}")
+        return html.replace("/firm/2025/202509281904249570.jpg", f"/firm/bench/{pid}.jpg")
+
+    def brand_all_page(self) -> str:
+        links = "".join(
+            f'<li><a href="BrandShow?Id={b}">基准品牌{b}</a></li>' for b in range(1, self.brands + 1)
+        )
+        return f'<html><head><title>品牌大全</title></head><body><div class="container"><ul>{links}</ul></div></body></html>'
+
+    def brand_show_page(self, brand: int) -> str:
+        links = "".join(
+            f'<li><a href="Product?Id={pid}">基准品牌{brand}-{pid}</a></li>' for pid in self.brand_ids(brand)
+        )
+        return f'<html><head><title>基准品牌{brand}</title></head><body><div class="container"><ul>{links}</ul></div></body></html>'
+
+    def route(self, path: str, query: dict) -> tuple[int, str, bytes]:
+        """返回 `(状态码, Content-Type, 响应体)`。"""
+        low = path.lower()
+        html_type = "text/html; charset=utf-8"
+        if low.startswith("/firms/"):
+            self.count("pages")
+            if self.delay_and_fail():
+                self.count("errors")
+                return 503, html_type, b""
+            arg = lambda k, d: int((query.get(k) or query.get(k.lower()) or [d])[0])
+            if low == "/firms/brands":
+                page = arg("page", 1)
+                if 1 <= page <= self.pages:
+                    return 200, html_type, self.catalog_page(page).encode("utf-8")
+            elif low == "/firms/product":
+                return 200, html_type, self.product_page(arg("Id", 0)).encode("utf-8")
+            elif low == "/firms/brandall":
+                return 200, html_type, self.brand_all_page().encode("utf-8")
+            elif low == "/firms/brandshow":
+                brand = arg("Id", 0)
+                if 1 <= brand <= self.brands:
+                    return 200, html_type, self.brand_show_page(brand).encode("utf-8")
+            return 404, html_type, b"not found"
+        if low.startswith("/firm/"):
+            self.count("images")
+            if self.delay_and_fail():
+                self.count("errors")
+                return 503, "image/jpeg", b""
+            return 200, "image/jpeg", self.image_bytes
+        # 样式、脚本、统计等静态资源返回空内容
+        self.count("static")
+        return 200, "text/plain", b""
+
+
+def strip_external_scripts(html: str) -> str:
+    """去掉引用外部站点的脚本（统计/分享），保证离线运行不访问外网。"""
+    return re.sub(r'<script[^>]*src="https?://[^"]*"[^>]*>\s*</script>', "", html)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        status, ctype, body = self.server.site.route(u.path, parse_qs(u.query))
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(site: FixtureSite, port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """在后台线程启动夹具站点，返回 `(server, base_url)`。"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    server.daemon_threads = True
+    server.site = site
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# 抓取模式：每种模式在独立子进程中运行，峰值 RSS 与 CPU 互不干扰
+CRAWL_MODES = {
+    "catalog-browser": ("catalog", {"fetch_mode": "browser", "workers": 1}),
+    "catalog-http": ("catalog", {"fetch_mode": "http", "workers": 1}),
+    "catalog-browser-w4": ("catalog", {"fetch_mode": "browser", "workers": 4}),
+    "catalog-http-w4": ("catalog", {"fetch_mode": "http", "workers": 4}),
+    "brands-browser": ("brands", {"fetch_mode": "browser"}),
+    "brands-http": ("brands", {"fetch_mode": "http"}),
+}
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def run_crawl_mode(mode: str, base: str, out_dir: str, delay: float, max_rate: float) -> dict:
+    """子进程入口：把 `etmoc.BASE` 指向夹具站点后运行一种抓取模式，返回耗时、条数与资源占用。"""
+    source, kwargs = CRAWL_MODES[mode]
+    etmoc.BASE = base
+    etmoc.SESSION_CONFIG["state_path"] = os.path.join(out_dir + ".state", "browser_state.json")
+    t0 = time.perf_counter()
+    if source == "catalog":
+        etmoc.crawl_catalog_with_playwright(
+            delay=delay, out_dir=out_dir, pages_limit=0, start_page=1, max_rate=max_rate, **kwargs
+        )
+        jsonl = etmoc.run_path(out_dir, "products_catalog.jsonl")
+    else:
+        etmoc.crawl_with_playwright(delay=delay, out_dir=out_dir, max_rate=max_rate, **kwargs)
+        jsonl = etmoc.run_path(out_dir, "products_playwright.jsonl")
+    elapsed = time.perf_counter() - t0
+    items = sum(1 for _ in etmoc.iter_jsonl(jsonl)) if os.path.exists(jsonl) else 0
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "mode": mode,
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_s": round(items / elapsed, 2) if elapsed else 0.0,
+        "cpu_s": round(own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime, 2),
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(children.ru_maxrss / 1024, 1),
+    }
+
+
+def comparable_items(out_dir: str, source: str) -> list[dict] | None:
+    """读取导出结果并去掉随输出目录变化的 `image_local`，按 URL 排序用于跨模式比对。"""
+    stem = "products_catalog" if source == "catalog" else "products_playwright"
+    path = os.path.join(out_dir, f"{stem}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    return sorted(
+        ({k: v for k, v in it.items() if k != "image_local"} for it in items),
+        key=lambda it: it.get("url", ""),
+    )
+
+
+def child_error(proc: subprocess.CompletedProcess) -> str:
+    """子进程失败时取最后一行异常信息（没有则取最后一行输出）。"""
+    lines = [ln.strip() for ln in (proc.stderr or proc.stdout or "").splitlines() if ln.strip()]
+    errors = [ln for ln in lines if re.match(r"^[\w.]+(Error|Exception)\b", ln)]
+    return (errors or lines or ["无输出"])[-1][:200]
+
+
+def bench_crawl(site: FixtureSite, modes: list[str], delay: float, max_rate: float) -> list[dict]:
+    """启动夹具站点，逐个子进程运行抓取模式；同一来源的各模式输出与该来源首个成功模式比对。"""
+    server, base = start_fixture_server(site)
+    work_dir = tempfile.mkdtemp(prefix="etmoc-bench-")
+    rows = []
+    expected: dict[str, list] = {}
+    try:
+        for mode in modes:
+            out_dir = os.path.join(work_dir, mode)
+            site.take_counters()
+            cmd = [
+                sys.executable, os.path.abspath(__file__),
+                "--run-mode", mode, "--base", base, "--out", out_dir,
+                "--delay", str(delay), "--max-rate", str(max_rate),
+            ]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            served = site.take_counters()
+            lines = [ln for ln in proc.stdout.splitlines() if ln.startswith(RESULT_PREFIX)]
+            if proc.returncode != 0 or not lines:
+                rows.append({"mode": mode, "error": child_error(proc)})
+                continue
+            row = json.loads(lines[-1][len(RESULT_PREFIX):])
+            row["requests"] = served["pages"] + served["images"]
+            row["injected_errors"] = served["errors"]
+            source = CRAWL_MODES[mode][0]
+            items = comparable_items(out_dir, source)
+            expected.setdefault(source, items)
+            row["same_output"] = items == expected[source]
+            rows.append(row)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return rows
+
+
+def print_crawl_report(rows: list[dict]):
+    print(
+        f"{'抓取模式':<22}{'条数':>6}{'耗时 s':>9}{'条/秒':>9}{'CPU s':>8}"
+        f"{'RSS MB':>9}{'子进程 MB':>11}{'请求':>7}{'注入错误':>9}  输出一致"
+    )
+    for r in rows:
+        if "error" in r:
+            print(f"{r['mode']:<22}失败：{r['error']}")
+            continue
+        print(
+            f"{r['mode']:<22}{r['items']:>6}{r['seconds']:>9.2f}{r['items_per_s']:>9.2f}{r['cpu_s']:>8.2f}"
+            f"{r['peak_rss_mb']:>9.1f}{r['peak_child_rss_mb']:>11.1f}{r['requests']:>7}{r['injected_errors']:>9}"
+            f"  {'是' if r['same_output'] else '否'}"
+        )
+
+
+def compare_with_baseline(rows: list[dict], baseline_path: str, tolerance: float) -> list[str]:
+    """与保存的基线比较各抓取模式的条/秒，下降超过 `tolerance`（比例）的记为回退。"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["mode"]: r for r in json.load(f).get("crawl", []) if "error" not in r}
+    regressions = []
+    for r in rows:
+        old = baseline.get(r["mode"])
+        if not old or "error" in r or not old.get("items_per_s"):
+            continue
+        if r["items_per_s"] < old["items_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{r['mode']}：{r['items_per_s']:.2f} 条/秒，低于基线 {old['items_per_s']:.2f}"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="ETMOC 抓取性能基准")
+    ap.add_argument("--repeat", type=int, default=50, help="每种解析方式的重复次数")
+    ap.add_argument(
+        "--suite",
+        choices=["parse", "crawl", "all"],
+        default="parse",
+        help="parse 仅解析基准；crawl 在本地夹具站点上运行抓取流程；all 两者都跑",
+    )
+    ap.add_argument(
+        "--modes",
+        type=str,
+        default=",".join(CRAWL_MODES),
+        help="逗号分隔的抓取模式，默认全部：" + ",".join(CRAWL_MODES),
+    )
+    ap.add_argument("--pages", type=int, default=5, help="夹具目录页数")
+    ap.add_argument("--per-page", type=int, default=10, help="夹具目录每页产品数")
+    ap.add_argument("--brands", type=int, default=5, help="夹具品牌数")
+    ap.add_argument("--per-brand", type=int, default=10, help="夹具每个品牌的产品数")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="夹具页面/图片的响应延迟（毫秒）")
+    ap.add_argument("--jitter", type=float, default=0.5, help="延迟抖动比例，0.5 表示 ±50%%")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="页面/图片返回 503 的概率")
+    ap.add_argument("--delay", type=float, default=0.02, help="抓取的初始请求间隔秒数")
+    ap.add_argument("--max-rate", type=float, default=100.0, help="抓取的限速上限（次/秒）")
+    ap.add_argument("--save", type=str, default=None, help="把结果写入 JSON 文件（可作为基线）")
+    ap.add_argument("--compare", type=str, default=None, help="与基线 JSON 比较，条/秒回退时退出码为 1")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="允许的条/秒下降比例，默认 0.2")
+    ap.add_argument("--serve", action="store_true", help="仅启动夹具站点供手动调试（Ctrl+C 退出）")
+    # 内部参数：由父进程调用子进程运行单个抓取模式
+    ap.add_argument("--run-mode", choices=list(CRAWL_MODES), help=argparse.SUPPRESS)
+    ap.add_argument("--base", type=str, help=argparse.SUPPRESS)
+    ap.add_argument("--out", type=str, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_mode:
+        res = run_crawl_mode(args.run_mode, args.base, args.out, args.delay, args.max_rate)
+        print(RESULT_PREFIX + json.dumps(res, ensure_ascii=False))
+        sys.exit(0)
+
+    site = FixtureSite(
+        pages=args.pages,
+        per_page=args.per_page,
+        brands=args.brands,
+        per_brand=args.per_brand,
+        latency_ms=args.latency_ms,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    if args.serve:
+        server, base = start_fixture_server(site, port=8765)
+        print(f"夹具站点：{base}/Firms/Brands （Ctrl+C 退出）")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        sys.exit(0)
+
+    failed = False
+    results: dict = {}
+    if args.suite in ("parse", "all"):
+        rows = bench_parsers(args.repeat)
+        print_parser_report(rows)
+        results["parse"] = rows
+        failed |= not all(r["same_output"] for r in rows)
+    if args.suite in ("crawl", "all"):
+        modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+        unknown = [m for m in modes if m not in CRAWL_MODES]
+        if unknown:
+            ap.error(f"未知抓取模式：{','.join(unknown)}")
+        rows = bench_crawl(site, modes, args.delay, args.max_rate)
+        print_crawl_report(rows)
+        results["crawl"] = rows
+        failed |= not all(r.get("same_output", False) for r in rows)
+        if args.compare:
+            regressions = compare_with_baseline(rows, args.compare, args.tolerance)
+            for msg in regressions:
+                print(f"性能回退：{msg}")
+            failed |= bool(regressions)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if failed:
+        sys.exit(1)
@@ -1,10 +1,9 @@
-import os, time, sys
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import os, sys
+from playwright.sync_api import sync_playwright
 
-BASE = "http://www.etmoc.com"
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0 Safari/537.36",
-}
+import playwright_scrape_etmoc as etmoc
+
+BASE = etmoc.BASE
 
 OUT_DIR = os.path.join(os.path.dirname(__file__), 'etmoc_output')
 # allow product id from argv
@@ -12,41 +11,26 @@ PRODUCT_ID = int(sys.argv[1]) if len(sys.argv) > 1 else 3595
 PRODUCT_URL = f"{BASE}/Firms/Product?Id={PRODUCT_ID}"
 
 
-def hex_str(s: str) -> str:
-    return ''.join(format(ord(c), 'x') for c in s)
-
-
 def ensure_out():
     os.makedirs(OUT_DIR, exist_ok=True)
 
 
 def dump_product_html(url: str, product_id: int):
     ensure_out()
+    # debug snapshots need the full page (styles and images), so no resource blocking
+    etmoc.ROUTE_CONFIG["enabled"] = False
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=HEADERS['User-Agent'])
-        page = context.new_page()
-        page.set_default_navigation_timeout(45000)
-        page.set_default_timeout(45000)
-        # set srcurl cookie and trigger verification URL
-        srcurl_hex = hex_str(f"{BASE}/firms/BrandAll")
-        context.add_cookies([{"name": "srcurl", "value": srcurl_hex, "domain": "www.etmoc.com", "path": "/"}])
-        try:
-            sv_hex = page.evaluate("(()=>{const s=`${screen.width},${screen.height}`;return Array.from(s).map(c=>c.charCodeAt(0).toString(16)).join('')})()")
-        except Exception:
-            sv_hex = hex_str("1280,900")
-        page.goto(f"{BASE}/firms/BrandAll?security_verify_data={sv_hex}", wait_until='load')
-        try:
-            page.wait_for_load_state('networkidle')
-        except PlaywrightTimeoutError:
-            page.wait_for_timeout(1200)
+        # reuse the saved verified session if still valid, otherwise verify and save it
+        context, page, reused = etmoc.open_verified_context(browser)
+        print("Session: reused saved state" if reused else "Session: verified")
         # go to brands page
         brands_url = f"{BASE}/Firms/Brands"
-        page.goto(brands_url, wait_until='domcontentloaded')
-        try:
-            page.wait_for_selector('body > div.container > div.row > div.col-8, body > div.container > nav', timeout=15000)
-        except PlaywrightTimeoutError:
-            page.wait_for_timeout(1200)
+        etmoc.browser_get(
+            page,
+            brands_url,
+            lambda pg: etmoc.wait_for_selector_safe(pg, 'body > div.container > div.row > div.col-8, body > div.container > nav'),
+        )
         brands_html = page.content()
         brands_html_path = os.path.join(OUT_DIR, 'debug_brands.html')
         with open(brands_html_path, 'w', encoding='utf-8') as f:
@@ -59,11 +43,11 @@ def dump_product_html(url: str, product_id: int):
         print(f"Saved Brands: {brands_html_path}\nScreenshot: {brands_png_path}")
 
         # go to product page
-        page.goto(url, wait_until='domcontentloaded')
-        try:
-            page.wait_for_selector('div.brand-title > h2, h1, .title, .product-title', timeout=15000)
-        except PlaywrightTimeoutError:
-            page.wait_for_timeout(1200)
+        etmoc.browser_get(
+            page,
+            url,
+            lambda pg: etmoc.wait_for_selector_safe(pg, 'div.brand-title > h2, h1, .title, .product-title'),
+        )
         html = page.content()
         html_path = os.path.join(OUT_DIR, f'debug_product_{product_id}.html')
         with open(html_path, 'w', encoding='utf-8') as f:
@@ -78,4 +62,4 @@ def dump_product_html(url: str, product_id: int):
 
 
 if __name__ == '__main__':
-    dump_product_html(PRODUCT_URL, PRODUCT_ID)
\ No newline at end of file
+    dump_product_html(PRODUCT_URL, PRODUCT_ID)
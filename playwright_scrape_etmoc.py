@@ -1,8 +1,29 @@
-import os, re, time, json, csv, shutil
+import os, re, time, json, csv, shutil, queue, threading, asyncio, tempfile, hashlib, weakref, sqlite3, random, math, zlib
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from decimal import Decimal
+import multiprocessing
 from tqdm import tqdm
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import requests
+import aiohttp
+
+try:
+    import lxml  # noqa: F401  可选解析后端，未安装时回退 html.parser
+
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+try:
+    import pyarrow as pa  # 可选依赖：类型化列式导出（Parquet / Arrow IPC）
+    import pyarrow.parquet as pq
+
+    HAS_PYARROW = True
+except ImportError:
+    pa = pq = None
+    HAS_PYARROW = False
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 
 BASE = "http://www.etmoc.com"
@@ -22,8 +43,21 @@ SELECTORS = {
     "product_title": "div.brand-title > h2",
     "image": "div.proImg img[src]",
     "pro_bar": "div.proBars div.proBar",
-    "wait_product_ready": "div.brand-title > h2, h1, .title, .product-title",
     "total_pages_anchor": "body > div.container > nav > ul > li:nth-child(12) > a",
+    "brand_links": 'a[href*="BrandShow?Id="]',
+    "brand_product_links": 'a[href*="Product?Id="]',
+    # 局部解析（SoupStrainer）后祖先节点不存在，使用不带 body 路径的等价选择器
+    "product_links_scoped": 'div.col-8 > ul a[href*="Product?Id="]',
+}
+
+# 解析后端与局部解析：product 仅保留标题/图片/参数块，catalog 仅保留左列
+PARSER_BACKENDS = ("auto", "lxml", "html.parser")
+PARSER = {"backend": "auto", "scoped": True}
+SCOPED_STRAINERS = {
+    "product": SoupStrainer(
+        "div", class_=re.compile(r"(?:^|\s)(?:brand-title|proImg|proBars)(?:\s|$)")
+    ),
+    "catalog": SoupStrainer("div", class_=re.compile(r"(?:^|\s)col-8(?:\s|$)")),
 }
 PAGINATION_CANDIDATES = [
     'nav.pagination a[rel="next"]',
@@ -93,17 +127,218 @@ class ProgressBar:
         print()
 
 
+# 分阶段耗时统计：按 (来源, 阶段) 聚合，结束时输出 p50/p95/p99 到 metrics.json 与 Prometheus 文本文件
+METRICS_CONFIG = {
+    "interval": 0.0,  # >0 时后台每隔该秒数刷新一次指标文件
+    "textfile": None,  # Prometheus 文本文件路径；None 表示 <out>/.run/metrics.prom
+}
+
+
+def percentile(sorted_samples: list[float], q: float) -> float:
+    """最近秩法分位数；样本须已排序，空样本返回 0。"""
+    if not sorted_samples:
+        return 0.0
+    k = min(len(sorted_samples), max(1, math.ceil(q * len(sorted_samples))))
+    return sorted_samples[k - 1]
+
+
+class StageMetrics:
+    """分阶段耗时直方图，跨线程共享。
+    - `timer(stage)` / `observe(stage, seconds)` 按当前来源 `source`（catalog/brands）归类记录。
+    - 次数、总耗时与最大值精确累计；样本超过 `max_samples` 后改为蓄水池抽样，分位数为估计值。
+    - `flush(out_dir)` 写出 `.run/metrics.json` 与 Prometheus 文本文件（均原子替换，不随输出提交）；
+      `start_flusher` 在长任务中按间隔后台刷新，`report` 停止刷新、写出最终结果并打印摘要。
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, max_samples: int = 20000):
+        self._lock = threading.Lock()
+        self.max_samples = max_samples
+        self._flusher = None
+        self.reset()
+
+    def reset(self, source: str = ""):
+        self.stop_flusher()
+        with self._lock:
+            self.source = source
+            self.started_at = time.time()
+            self.stages: dict[tuple[str, str], dict] = {}
+
+    def observe(self, stage: str, seconds: float):
+        key = (self.source, stage)
+        with self._lock:
+            st = self.stages.get(key)
+            if st is None:
+                st = self.stages[key] = {"count": 0, "sum": 0.0, "max": 0.0, "samples": []}
+            st["count"] += 1
+            st["sum"] += seconds
+            st["max"] = max(st["max"], seconds)
+            samples = st["samples"]
+            if len(samples) < self.max_samples:
+                samples.append(seconds)
+            else:
+                k = random.randrange(st["count"])
+                if k < self.max_samples:
+                    samples[k] = seconds
+
+    def take_samples(self) -> list[tuple[str, float]]:
+        """取出并清空已记录的样本，供解析子进程把耗时回传给主进程。"""
+        with self._lock:
+            out = [(stage, x) for (_, stage), st in self.stages.items() for x in st["samples"]]
+            self.stages = {}
+        return out
+
+    @contextmanager
+    def timer(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def summary(self) -> dict:
+        """`{来源: {阶段: {count, sum, mean, max, p50, p95, p99}}}`，耗时单位为秒。"""
+        with self._lock:
+            snapshot = [
+                (key, st["count"], st["sum"], st["max"], sorted(st["samples"]))
+                for key, st in self.stages.items()
+            ]
+        out: dict = {}
+        for (source, stage), count, total, peak, samples in snapshot:
+            row = {
+                "count": count,
+                "sum": round(total, 6),
+                "mean": round(total / count, 6),
+                "max": round(peak, 6),
+            }
+            for q in self.QUANTILES:
+                row[f"p{int(q * 100)}"] = round(percentile(samples, q), 6)
+            out.setdefault(source or "unknown", {})[stage] = row
+        return out
+
+    def prometheus_text(self, summary: dict) -> str:
+        lines = [
+            "# HELP etmoc_stage_seconds Duration of each crawl stage in seconds.",
+            "# TYPE etmoc_stage_seconds summary",
+        ]
+        for source, stages in summary.items():
+            for stage, row in stages.items():
+                labels = f'source="{source}",stage="{stage}"'
+                for q in self.QUANTILES:
+                    lines.append(
+                        f'etmoc_stage_seconds{{{labels},quantile="{q}"}} {row[f"p{int(q * 100)}"]}'
+                    )
+                lines.append(f"etmoc_stage_seconds_sum{{{labels}}} {row['sum']}")
+                lines.append(f"etmoc_stage_seconds_count{{{labels}}} {row['count']}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, out_dir: str):
+        summary = self.summary()
+        save_json(
+            {"started_at": self.started_at, "updated_at": time.time(), "stages": summary},
+            run_path(out_dir, "metrics.json"),
+        )
+        path = METRICS_CONFIG["textfile"] or run_path(out_dir, "metrics.prom")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text(summary))
+        os.replace(tmp, path)
+
+    def start_flusher(self, out_dir: str, interval: float):
+        self.stop_flusher()
+        if not interval or interval <= 0:
+            return
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                try:
+                    self.flush(out_dir)
+                except Exception as e:
+                    print(f"指标刷新失败: {e}")
+
+        t = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+        t.start()
+        self._flusher = (stop, t)
+
+    def stop_flusher(self):
+        if self._flusher:
+            stop, t = self._flusher
+            stop.set()
+            t.join()
+            self._flusher = None
+
+    def report(self, out_dir: str):
+        self.stop_flusher()
+        if not self.stages:
+            return
+        self.flush(out_dir)
+        for source, stages in self.summary().items():
+            print(f"阶段耗时（{source}，ms）：")
+            for stage, row in sorted(stages.items(), key=lambda kv: -kv[1]["sum"]):
+                print(
+                    f"  {stage:<22}{row['count']:>7} 次  p50 {row['p50'] * 1000:>8.1f}"
+                    f"  p95 {row['p95'] * 1000:>8.1f}  p99 {row['p99'] * 1000:>8.1f}"
+                    f"  合计 {row['sum']:.1f}s"
+                )
+
+
+METRICS = StageMetrics()
+
+
+def resolve_parser(backend: str | None = None) -> str:
+    b = backend or PARSER["backend"]
+    if b == "auto" or (b == "lxml" and not HAS_LXML):
+        return "lxml" if HAS_LXML else "html.parser"
+    return b
+
+
+def make_soup(
+    html: str, scope: str | None = None, backend: str | None = None
+) -> BeautifulSoup:
+    """按配置的后端解析 HTML。
+    `scope` 为 `product`/`catalog` 且启用局部解析时，只构建所需子树（见 `SCOPED_STRAINERS`）。
+    """
+    parser = resolve_parser(backend)
+    with METRICS.timer("parse"):
+        if scope and PARSER["scoped"]:
+            return BeautifulSoup(html, parser, parse_only=SCOPED_STRAINERS[scope])
+        return BeautifulSoup(html, parser)
+
+
+def make_product_soup(html: str, backend: str | None = None) -> BeautifulSoup:
+    """详情页解析：优先局部解析；缺少标题块（结构变化或异常页）时回退整页解析，
+    以便 `get_title_from_soup` 仍能使用 `<title>` 兜底。
+    """
+    soup = make_soup(html, "product", backend)
+    if PARSER["scoped"] and not soup.select_one(SELECTORS["product_title"]):
+        soup = make_soup(html, None, backend)
+    return soup
+
+
+def select_catalog_anchors(soup: BeautifulSoup) -> list:
+    return soup.select(SELECTORS["product_links_in_catalog"]) or soup.select(
+        SELECTORS["product_links_scoped"]
+    )
+
+
 def text_clean(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "")).strip()
 
 
+BRAND_LINK_PATTERN = r"(?i)BrandShow\?Id=\d+"
+PRODUCT_LINK_PATTERN = r"(?i)Product\?Id=\d+"
+
+
 def find_links(html: str, pattern: str) -> list:
-    soup = BeautifulSoup(html, "html.parser")
-    links = set()
+    """页面中 href 匹配 `pattern` 的链接，按文档顺序去重。"""
+    soup = make_soup(html)
+    links = {}
     for a in soup.find_all("a", href=True):
         href = a["href"]
         if re.search(pattern, href, flags=re.IGNORECASE):
-            links.add(href)
+            links[href] = None
     return list(links)
 
 
@@ -126,6 +361,8 @@ def hex_str(s: str) -> str:
 
 
 def ensure_clean_out(out_dir: str):
+    with _IMAGE_STORES_LOCK:
+        _IMAGE_STORES.pop(os.path.abspath(out_dir), None)
     if os.path.isdir(out_dir):
         for name in os.listdir(out_dir):
             path = os.path.join(out_dir, name)
@@ -141,8 +378,11 @@ def ensure_clean_out(out_dir: str):
 
 
 def save_json(items: list, path: str):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
+    tmp = path + ".tmp"
+    with METRICS.timer("write_json"):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
 
 
 def save_csv(items: list, path: str):
@@ -150,14 +390,910 @@ def save_csv(items: list, path: str):
     for it in items:
         keys.update(it.get("info", {}).keys())
     cols = ["title", "url"] + sorted(keys)
-    with open(path, "w", newline="", encoding="utf-8") as f:
+    tmp = path + ".tmp"
+    with METRICS.timer("write_csv"):
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(cols)
+            for it in items:
+                row = [it.get("title", ""), it.get("url", "")] + [
+                    it.get("info", {}).get(k, "") for k in cols[2:]
+                ]
+                w.writerow(row)
+        os.replace(tmp, path)
+
+
+# 流式输出：解析结果逐条追加到 JSONL，JSON/CSV 由 JSONL 派生导出
+JSONL_FSYNC_EVERY = 20
+# 本次运行的流水、日志与统计放在 `<out>/.run/`：目录自带忽略全部内容的 `.gitignore`，
+# 提交输出目录时只包含产品导出，不会因每次运行的流水产生改动
+RUN_DIR = ".run"
+
+
+def run_path(out_dir: str, name: str) -> str:
+    """返回 `<out>/.run/<name>`；首次使用时创建目录并写入 `.gitignore`。"""
+    d = os.path.join(out_dir, RUN_DIR)
+    os.makedirs(d, exist_ok=True)
+    ignore = os.path.join(d, ".gitignore")
+    if not os.path.exists(ignore):
+        with open(ignore, "w", encoding="utf-8") as f:
+            f.write("*\n")
+    return os.path.join(d, name)
+
+
+class JsonlSink:
+    """追加写入的 JSONL 输出：每条条目解析完成即写入，按批 fsync，崩溃时最多丢失未同步的一批。"""
+
+    def __init__(
+        self,
+        path: str,
+        fsync_every: int = JSONL_FSYNC_EVERY,
+        append: bool = False,
+        stage: str = "write_jsonl",
+    ):
+        self.path = path
+        self.fsync_every = max(int(fsync_every or 1), 1)
+        self.stage = stage
+        self.count = 0
+        self._unsynced = 0
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, item: dict):
+        with METRICS.timer(self.stage):
+            self._f.write(json.dumps(item, ensure_ascii=False) + "\n")
+            self.count += 1
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self.sync()
+
+    def sync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        if not self._f.closed:
+            self.sync()
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path: str):
+    """逐行读取 JSONL；跳过崩溃时可能残留的半行。"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"JSONL 第 {lineno} 行不完整，已跳过：{path}")
+
+
+def truncate_partial_line(path: str, chunk: int = 65536):
+    """截掉文件末尾不以换行结束的半行（崩溃时的残留写入），使之后的追加从新行开始。"""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - chunk)
+            f.seek(start)
+            block = f.read(pos - start)
+            if pos == end and block.endswith(b"\n"):
+                return
+            nl = block.rfind(b"\n")
+            if nl >= 0:
+                f.truncate(start + nl + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def with_image_local(item: dict, image_map: dict | None) -> dict:
+    imgs = item.get("images") or []
+    if image_map and imgs and imgs[0] in image_map:
+        item["image_local"] = image_map[imgs[0]]
+    return item
+
+
+def first_image_urls(items) -> list[str]:
+    urls = []
+    seen = set()
+    for it in items:
+        imgs = it.get("images") or []
+        if imgs and imgs[0] not in seen:
+            seen.add(imgs[0])
+            urls.append(imgs[0])
+    return urls
+
+
+def iter_items(source):
+    """条目来源：JSONL 路径逐行读取，其余视为条目可迭代对象。"""
+    return iter_jsonl(source) if isinstance(source, str) else iter(source)
+
+
+def export_json_from_jsonl(source, path: str, image_map: dict | None = None) -> int:
+    """由 JSONL 路径或条目可迭代对象流式导出 JSON 数组（格式与 `save_json` 一致），
+    写临时文件后原子替换。"""
+    n = 0
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[")
+        for it in iter_items(source):
+            body = json.dumps(with_image_local(it, image_map), ensure_ascii=False, indent=2)
+            f.write(("\n" if n == 0 else ",\n") + "\n".join("  " + ln for ln in body.split("\n")))
+            n += 1
+        f.write("\n]" if n else "]")
+    os.replace(tmp, path)
+    return n
+
+
+def export_csv_from_jsonl(source, path: str) -> int:
+    """由 JSONL 路径或条目可迭代对象导出 CSV：先流式预扫描收集 `info` 键的并集，再逐行写出
+    （列与 `save_csv` 一致）。来源会被遍历两遍，条目可迭代对象须可重复迭代（如列表、字典视图）。"""
+    if not isinstance(source, str) and iter(source) is source:
+        raise TypeError("export_csv_from_jsonl 需要可重复迭代的条目来源")
+    keys = set()
+    for it in iter_items(source):
+        keys.update(it.get("info", {}).keys())
+    cols = ["title", "url"] + sorted(keys)
+    n = 0
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
         w.writerow(cols)
-        for it in items:
-            row = [it.get("title", ""), it.get("url", "")] + [
-                it.get("info", {}).get(k, "") for k in cols[2:]
+        for it in iter_items(source):
+            w.writerow(
+                [it.get("title", ""), it.get("url", "")]
+                + [it.get("info", {}).get(k, "") for k in cols[2:]]
+            )
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+
+def export_from_jsonl(
+    jsonl_path: str,
+    out_dir: str,
+    stem: str,
+    image_map: dict | None = None,
+    sqlite: bool = False,
+) -> int:
+    with METRICS.timer("write_json"):
+        n = export_json_from_jsonl(jsonl_path, os.path.join(out_dir, f"{stem}.json"), image_map)
+    with METRICS.timer("write_csv"):
+        export_csv_from_jsonl(jsonl_path, os.path.join(out_dir, f"{stem}.csv"))
+    if sqlite:
+        save_sqlite(
+            (with_image_local(it, image_map) for it in iter_jsonl(jsonl_path)),
+            os.path.join(out_dir, f"{stem}.db"),
+        )
+    col_path = columnar_path(out_dir, stem)
+    if col_path:
+        save_columnar(
+            (with_image_local(it, image_map) for it in iter_jsonl(jsonl_path)),
+            col_path,
+            EXPORT_CONFIG["columnar"],
+        )
+    return n
+
+
+# 持久化产品库：按产品 Id 增量 upsert，记录页面指纹以跳过未变化详情页的解析
+PRODUCT_ID_REGEX = re.compile(r"[?&]Id=(\d+)", re.I)
+
+
+def product_id_from_url(url: str) -> str | None:
+    m = PRODUCT_ID_REGEX.search(url or "")
+    return m.group(1) if m else None
+
+
+def html_fingerprint(html: str) -> str:
+    """页面内容指纹：去掉脚本/样式/注释（统计参数等易变部分）并归一空白后取 sha1。"""
+    body = re.sub(r"(?is)<script\b.*?</script>|<style\b.*?</style>|<!--.*?-->", "", html or "")
+    return hashlib.sha1(re.sub(r"\s+", " ", body).encode("utf-8")).hexdigest()
+
+
+def item_hash(item: dict) -> str:
+    return hashlib.sha1(
+        json.dumps(item, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def save_store_index(index: dict[str, list], store_size: int, store_digest: str, path: str):
+    """原子写入产品库索引：每个 Id 一行 `[哈希, 偏移, 长度]`；
+    `store_size` 与 `store_digest`（库文件首行记录的记录摘要）用于判断索引是否与库文件对应。
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(
+            '{"version": 1, "store_size": %d, "store_digest": %s, "products": {'
+            % (store_size, json.dumps(store_digest))
+        )
+        for n, (pid, entry) in enumerate(index.items()):
+            f.write(("\n" if n == 0 else ",\n") + json.dumps(pid) + ": " + json.dumps(entry))
+        f.write("\n}}\n")
+    os.replace(tmp, path)
+
+
+class StoreItems:
+    """产品库条目的只读视图：每次迭代都从记录字典重新取 `item`。"""
+
+    def __init__(self, records: dict):
+        self.records = records
+
+    def __iter__(self):
+        return (rec["item"] for rec in self.records.values())
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+class ProductStore:
+    """按产品 Id 保存的条目库（`out/product_store.json`），跨增量运行保留。
+    - 每条记录含页面指纹 `fingerprint`、条目哈希 `hash` 与条目本身 `item`。
+    - 指纹未变的详情页直接复用已存条目，不再解析；条目哈希未变时不计为改动。
+    - 文件每条记录一行，顺序稳定，未变化的记录在提交差异中保持不动。
+    - 首次使用且库文件不存在时，从已有 `products_catalog.json` 导入。
+    """
+
+    FILE_NAME = "product_store.json"
+    INDEX_NAME = "product_index.json"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        self.dirty = False
+        self.stats = {"added": 0, "updated": 0, "unchanged": 0, "reused": 0}
+        self._added: list[str] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, out_dir: str, seed_json: str | None = None) -> "ProductStore":
+        store = cls(os.path.join(out_dir, cls.FILE_NAME))
+        if os.path.exists(store.path):
+            with open(store.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            store.records = dict(data.get("products", {}))
+        elif seed_json and os.path.exists(seed_json):
+            try:
+                with open(seed_json, "r", encoding="utf-8") as f:
+                    seed = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"产品库导入失败 {seed_json}: {e}")
+                seed = []
+            for it in seed:
+                pid = product_id_from_url(it.get("url", ""))
+                if pid and pid not in store.records:
+                    store.records[pid] = {
+                        "fingerprint": None,
+                        "hash": item_hash(it),
+                        "item": it,
+                    }
+            store.dirty = bool(store.records)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, pid: str) -> bool:
+        return pid in self.records
+
+    def lookup_unchanged(self, url: str, fingerprint: str | None) -> dict | None:
+        """页面指纹与库中一致时返回已存条目（副本），否则 None。"""
+        pid = product_id_from_url(url)
+        with self._lock:
+            rec = self.records.get(pid) if pid else None
+            if rec and fingerprint and rec.get("fingerprint") == fingerprint:
+                self.stats["reused"] += 1
+                return json.loads(json.dumps(rec["item"], ensure_ascii=False))
+        return None
+
+    def upsert(self, url: str, item: dict, fingerprint: str | None = None) -> bool:
+        """写入条目；返回内容是否发生变化。沿用旧记录中同一图片的 `image_local`。"""
+        pid = product_id_from_url(url)
+        if not pid:
+            return False
+        with self._lock:
+            rec = self.records.get(pid)
+            if rec:
+                old = rec["item"]
+                if (
+                    "image_local" in old
+                    and "image_local" not in item
+                    and (old.get("images") or [None])[0] == (item.get("images") or [None])[0]
+                ):
+                    item = dict(item, image_local=old["image_local"])
+            h = item_hash(item)
+            if rec and rec.get("hash") == h:
+                self.stats["unchanged"] += 1
+                if fingerprint and rec.get("fingerprint") != fingerprint:
+                    rec["fingerprint"] = fingerprint
+                    self.dirty = True
+                return False
+            self.records[pid] = {"fingerprint": fingerprint, "hash": h, "item": item}
+            self.stats["updated" if rec else "added"] += 1
+            if not rec:
+                self._added.append(pid)
+            self.dirty = True
+            return True
+
+    def merge_order(self, run_ids: list[str]):
+        """按本次抓取的目录顺序（新 → 旧）放置本次新增的记录，已有记录保持原有相对顺序。
+        新记录插在其后第一个已知记录之前；其后无已知记录时接在其前最后一个已知记录之后；
+        本次全部为新记录时置于最前。
+        """
+        with self._lock:
+            added = set(self._added)
+            if not added:
+                return
+            before: dict[str, list[str]] = {}
+            pending: list[str] = []
+            last_known = None
+            for pid in dict.fromkeys(run_ids):
+                if pid not in self.records:
+                    continue
+                if pid in added:
+                    pending.append(pid)
+                    continue
+                if pending:
+                    before[pid] = pending
+                    pending = []
+                last_known = pid
+            order = list(pending) if last_known is None else []
+            for pid in self.records:
+                if pid in added:
+                    continue
+                order.extend(before.get(pid, []))
+                order.append(pid)
+                if pid == last_known:
+                    order.extend(pending)
+            placed = set(order)
+            order = [pid for pid in self._added if pid not in placed] + order
+            self.records = {pid: self.records[pid] for pid in order}
+            self._added.clear()
+            self.dirty = True
+
+    def items(self) -> list[dict]:
+        return [rec["item"] for rec in self.records.values()]
+
+    def item_view(self) -> "StoreItems":
+        """按库顺序惰性产出条目的视图，可重复迭代，导出时不再复制整份条目列表。"""
+        return StoreItems(self.records)
+
+    def fingerprint(self, url: str) -> str | None:
+        pid = product_id_from_url(url)
+        with self._lock:
+            rec = self.records.get(pid) if pid else None
+            return rec.get("fingerprint") if rec else None
+
+    def apply_image_map(self, image_map: dict):
+        """把本次下载得到的本地图片路径写回条目（路径变化才计为改动）。"""
+        with self._lock:
+            for rec in self.records.values():
+                it = rec["item"]
+                imgs = it.get("images") or []
+                if imgs and imgs[0] in image_map and it.get("image_local") != image_map[imgs[0]]:
+                    it["image_local"] = image_map[imgs[0]]
+                    rec["hash"] = item_hash(it)
+                    self.dirty = True
+
+    def save(self):
+        """原子写入库文件：每条记录一行，便于增量提交时只产生改动行的差异。
+        首行记录全部记录行的 sha1（`digest`）；同时写出索引 `.run/product_index.json`（Id → 条目哈希与该行的字节偏移/长度，
+        以及库文件大小与 digest），供 `diff_runs` 只读取变化的记录；
+        偏移随任一记录变化整体移动，索引放在运行期目录，不随输出提交。
+        """
+        tmp = self.path + ".tmp"
+        index: dict[str, list] = {}
+        with METRICS.timer("write_store"):
+            lines = [
+                (pid, rec, (json.dumps(pid) + ": " + json.dumps(rec, ensure_ascii=False)).encode("utf-8"))
+                for pid, rec in self.records.items()
             ]
-            w.writerow(row)
+            # 首行的 digest 覆盖全部记录行，随库文件一起原子替换；索引据此判断是否仍对应当前库文件
+            digest = hashlib.sha1(b"\n".join(line for _, _, line in lines)).hexdigest()
+            with open(tmp, "wb") as f:
+                f.write(b'{"version": 1, "digest": "%s", "products": {' % digest.encode())
+                for n, (pid, rec, line) in enumerate(lines):
+                    f.write(b"\n" if n == 0 else b",\n")
+                    index[pid] = [rec.get("hash"), f.tell(), len(line)]
+                    f.write(line)
+                f.write(b"\n}}\n")
+                size = f.tell()
+            os.replace(tmp, self.path)
+            save_store_index(index, size, digest, run_path(os.path.dirname(self.path), self.INDEX_NAME))
+        self.dirty = False
+
+
+# SQLite 输出：products 表以产品 Id 为主键，info 存为 JSON 列；条码、品名、上市时间单独成列并建索引，
+# `--action query` 直接走索引查询，无需加载整份 JSON
+SQLITE_BATCH = 200
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT,
+    name_cn TEXT,
+    name_en TEXT COLLATE NOCASE,
+    pack_barcode TEXT,
+    carton_barcode TEXT,
+    release_date TEXT,
+    info TEXT NOT NULL,
+    images TEXT NOT NULL,
+    image_local TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_pack_barcode ON products(pack_barcode);
+CREATE INDEX IF NOT EXISTS idx_products_carton_barcode ON products(carton_barcode);
+CREATE INDEX IF NOT EXISTS idx_products_name_cn ON products(name_cn);
+CREATE INDEX IF NOT EXISTS idx_products_name_en ON products(name_en);
+CREATE INDEX IF NOT EXISTS idx_products_release_date ON products(release_date);
+"""
+SQLITE_COLUMNS = (
+    "id",
+    "position",
+    "url",
+    "title",
+    "name_cn",
+    "name_en",
+    "pack_barcode",
+    "carton_barcode",
+    "release_date",
+    "info",
+    "images",
+    "image_local",
+)
+SQLITE_UPSERT = (
+    f"INSERT OR REPLACE INTO products ({', '.join(SQLITE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in SQLITE_COLUMNS)})"
+)
+
+
+def sqlite_row(item: dict, position: int) -> tuple | None:
+    """把条目映射为 products 表的一行；URL 中无产品 Id 时返回 None。"""
+    pid = product_id_from_url(item.get("url", ""))
+    if not pid:
+        return None
+    info = item.get("info") or {}
+    return (
+        int(pid),
+        position,
+        item.get("url", ""),
+        item.get("title"),
+        info.get("中文品名"),
+        info.get("英文品名"),
+        info.get("小盒条码"),
+        info.get("条盒条码"),
+        info.get("上市时间") or info.get("发行时间"),
+        json.dumps(info, ensure_ascii=False),
+        json.dumps(item.get("images") or [], ensure_ascii=False),
+        item.get("image_local"),
+    )
+
+
+class SqliteSink:
+    """SQLite 产品表的批量写入器：条目先缓冲，每 `batch` 条在一个事务内 upsert（主键为产品 Id）。
+    `position` 记录写入顺序，查询结果按其排序即与 JSON 导出顺序一致；无产品 Id 的条目跳过。
+    与其他导出一样整表重建：写入 `<path>.tmp`，关闭时原子替换 `path`，旧库中本次没有的行不会残留。
+    支持 `with` 语句，关闭时提交剩余条目；块内出错时丢弃临时库，保留原有文件。
+    """
+
+    def __init__(self, path: str, batch: int = SQLITE_BATCH):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.batch = max(1, int(batch or 1))
+        self.count = 0
+        self.skipped = 0
+        self._rows: list[tuple] = []
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn = sqlite3.connect(self.tmp)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    def write(self, item: dict):
+        row = sqlite_row(item, self.count)
+        if row is None:
+            self.skipped += 1
+            return
+        self._rows.append(row)
+        self.count += 1
+        if len(self._rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            with self.conn:
+                self.conn.executemany(SQLITE_UPSERT, self._rows)
+            self._rows = []
+
+    def close(self, commit: bool = True):
+        if self.conn is None:
+            return
+        if commit:
+            self.flush()
+        self.conn.close()
+        self.conn = None
+        if commit:
+            os.replace(self.tmp, self.path)
+        elif os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(commit=exc_type is None)
+
+
+def save_sqlite(items, path: str, batch: int = SQLITE_BATCH) -> int:
+    """把条目（可为生成器）批量写入 SQLite 产品表，返回写入条数。"""
+    with METRICS.timer("write_sqlite"), SqliteSink(path, batch) as db:
+        for it in items:
+            db.write(it)
+    if db.skipped:
+        print(f"SQLite：{db.skipped} 条缺少产品 Id，未写入")
+    return db.count
+
+
+def query_sqlite(
+    path: str,
+    product_id: str | None = None,
+    barcode: str | None = None,
+    name: str | None = None,
+    released: str | None = None,
+    limit: int = 0,
+) -> list[dict]:
+    """按条件查询 SQLite 产品表（条件之间为 AND），结果按写入顺序返回条目。
+    - product_id：产品 Id 精确匹配。
+    - barcode：小盒或条盒条码精确匹配。
+    - name：中文或英文品名前缀匹配（英文不区分大小写）。
+    - released：上市时间前缀匹配，如 `2025`。
+    前缀匹配改写为区间比较，均可走索引。
+    """
+    clauses, params = [], []
+    if product_id:
+        clauses.append("id = ?")
+        params.append(int(product_id))
+    if barcode:
+        clauses.append("(pack_barcode = ? OR carton_barcode = ?)")
+        params += [barcode, barcode]
+    if name:
+        hi = name + "\U0010ffff"
+        clauses.append(
+            "((name_cn >= ? AND name_cn < ?) OR (name_en >= ? AND name_en < ?))"
+        )
+        params += [name, hi, name, hi]
+    if released:
+        clauses.append("(release_date >= ? AND release_date < ?)")
+        params += [released, released + "\U0010ffff"]
+    sql = "SELECT url, title, info, images, image_local FROM products"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY position"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    items = []
+    for url, title, info, images, image_local in rows:
+        it = {"title": title, "url": url, "info": json.loads(info), "images": json.loads(images)}
+        if image_local:
+            it["image_local"] = image_local
+        items.append(it)
+    return items
+
+
+# 类型化列式输出：把 `KEYS_WHITELIST` 字段解析为数值、金额、ISO 日期与校验过的条码，
+# 导出 Parquet 或 Arrow IPC 文件供向量化分析（需可选依赖 pyarrow）
+COLUMNAR_FORMATS = ("parquet", "arrow")
+EXPORT_CONFIG = {"columnar": None}  # None、"parquet" 或 "arrow"
+MG_REGEX = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*mg\s*$", re.I)
+MM_REGEX = re.compile(r"(\d+(?:\.\d+)?)\s*mm", re.I)
+YUAN_REGEX = re.compile(r"(\d+(?:\.\d+)?)\s*元\s*[/／]\s*(?:每)?\s*(盒|条|支)")
+DATE_REGEX = re.compile(r"((?:19|20)\d{2})\s*年(?:\s*(\d{1,2})\s*月)?(?:\s*(\d{1,2})\s*日)?")
+PACKAGE_REGEX = re.compile(r"^(.*?)\s*[（(]\s*每盒\s*(\d+)\s*支\s*(?:[，,]\s*每条\s*(\d+)\s*盒\s*)?[）)]")
+STICK_GAUGES = ("细支", "中支", "粗支", "短支")
+CENT = Decimal("0.01")
+# (列名, 类型)；类型见 `columnar_type`
+TYPED_COLUMNS = [
+    ("id", "int64"),
+    ("position", "int32"),
+    ("url", "string"),
+    ("title", "string"),
+    ("name_cn", "string"),
+    ("name_en", "string"),
+    ("product_type", "string"),
+    ("flavor", "string"),
+    ("tar_mg", "float64"),
+    ("nicotine_mg", "float64"),
+    ("co_mg", "float64"),
+    ("package", "string"),
+    ("sticks_per_pack", "int16"),
+    ("packs_per_carton", "int16"),
+    ("stick_length_mm", "float64"),
+    ("stick_diameter_mm", "float64"),
+    ("stick_circumference_mm", "float64"),
+    ("filter_length_mm", "float64"),
+    ("stick_gauge", "string"),
+    ("capsule", "bool"),
+    ("pack_barcode", "string"),
+    ("pack_barcode_valid", "bool"),
+    ("carton_barcode", "string"),
+    ("carton_barcode_valid", "bool"),
+    ("pack_price_yuan", "decimal"),
+    ("carton_price_yuan", "decimal"),
+    ("suggested_price_yuan", "decimal"),
+    ("wholesale_price_yuan", "decimal"),
+    ("wholesale_unit", "string"),
+    ("release_date", "string"),
+    ("release_year", "int16"),
+    ("issue_date", "string"),
+    ("issue_year", "int16"),
+    ("image_local", "string"),
+]
+
+
+def parse_mg(v: str | None) -> float | None:
+    """`10mg` → 10.0；`中` 等非数值返回 None。"""
+    m = MG_REGEX.match(v or "")
+    return float(m.group(1)) if m else None
+
+
+def parse_yuan(v: str | None) -> tuple[Decimal | None, str | None]:
+    """`20 元/盒`、`93.28元/条`、`560元/条（10支）` → (金额, 计价单位)；金额精确到分。"""
+    m = YUAN_REGEX.search(v or "")
+    if not m:
+        return None, None
+    return Decimal(m.group(1)).quantize(CENT), m.group(2)
+
+
+def parse_iso_date(v: str | None) -> tuple[str | None, int | None]:
+    """`2017 年` → (`2017`, 2017)，`2017 年 5 月 3 日` → (`2017-05-03`, 2017)；保留原有精度。"""
+    m = DATE_REGEX.search(v or "")
+    if not m:
+        return None, None
+    year, month, day = m.group(1), m.group(2), m.group(3)
+    iso = year
+    if month and 1 <= int(month) <= 12:
+        iso += f"-{int(month):02d}"
+        if day and 1 <= int(day) <= 31:
+            iso += f"-{int(day):02d}"
+    return iso, int(year)
+
+
+def gtin_valid(code: str | None) -> bool:
+    """EAN-8 / UPC-A / EAN-13 / GTIN-14 校验位检查。"""
+    if not code or not re.fullmatch(r"\d{8}|\d{12,14}", code):
+        return False
+    digits = [int(c) for c in code]
+    check = digits.pop()
+    total = sum(d * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(digits)))
+    return (10 - total % 10) % 10 == check
+
+
+def parse_stick_spec(v: str | None) -> dict:
+    """`97mm 细支 爆珠`、`长度 90mm，直径 15.9mm，圆周 50mm` → 长度/直径/圆周（mm）、粗细与是否爆珠。"""
+    v = v or ""
+    out = {"stick_gauge": next((g for g in STICK_GAUGES if g in v), None), "capsule": "爆珠" in v}
+    for key, label in (
+        ("stick_length_mm", "长度"),
+        ("stick_diameter_mm", "直径"),
+        ("stick_circumference_mm", "圆周"),
+    ):
+        m = re.search(label + r"\s*(\d+(?:\.\d+)?)\s*mm", v)
+        out[key] = float(m.group(1)) if m else None
+    if out["stick_length_mm"] is None:
+        m = MM_REGEX.search(v)
+        out["stick_length_mm"] = float(m.group(1)) if m else None
+    return out
+
+
+def normalize_item(item: dict, position: int = 0) -> dict:
+    """把一条详情条目规范为 `TYPED_COLUMNS` 的类型化记录；无法解析的字段为 None，条码保留原文并给出校验结果。"""
+    info = item.get("info") or {}
+
+    def first(*keys):
+        return next((info[k] for k in keys if info.get(k)), None)
+
+    pid = product_id_from_url(item.get("url", ""))
+    rec = {
+        "id": int(pid) if pid else None,
+        "position": position,
+        "url": item.get("url"),
+        "title": item.get("title"),
+        "name_cn": info.get("中文品名"),
+        "name_en": info.get("英文品名"),
+        "product_type": first("产品类型", "类型"),
+        "flavor": info.get("香型"),
+        "tar_mg": parse_mg(info.get("焦油量")),
+        "nicotine_mg": parse_mg(info.get("烟碱量")),
+        "co_mg": parse_mg(info.get("一氧化碳量")),
+        "image_local": item.get("image_local"),
+    }
+    package = info.get("包装形式") or ""
+    m = PACKAGE_REGEX.match(package)
+    rec["package"] = text_clean(m.group(1)) if m else (package or None)
+    rec["sticks_per_pack"] = int(m.group(2)) if m else None
+    rec["packs_per_carton"] = int(m.group(3)) if m and m.group(3) else None
+    rec.update(parse_stick_spec(first("烟支规格", "规格")))
+    if rec["stick_length_mm"] is None:
+        m = MM_REGEX.search(info.get("烟支长度") or "")
+        rec["stick_length_mm"] = float(m.group(1)) if m else None
+    m = MM_REGEX.search(info.get("过滤嘴长度") or "")
+    rec["filter_length_mm"] = float(m.group(1)) if m else None
+    for col, key in (("pack_barcode", "小盒条码"), ("carton_barcode", "条盒条码")):
+        code = re.sub(r"\s+", "", info.get(key) or "") or None
+        rec[col] = code
+        rec[f"{col}_valid"] = gtin_valid(code) if code else None
+    rec["pack_price_yuan"] = parse_yuan(first("小盒零售价", "小盒售价", "单盒售价"))[0]
+    rec["carton_price_yuan"] = parse_yuan(first("条盒零售价", "条盒售价", "单条售价"))[0]
+    rec["suggested_price_yuan"] = parse_yuan(info.get("建议零售价"))[0]
+    rec["wholesale_price_yuan"], rec["wholesale_unit"] = parse_yuan(info.get("批发价格"))
+    rec["release_date"], rec["release_year"] = parse_iso_date(info.get("上市时间"))
+    rec["issue_date"], rec["issue_year"] = parse_iso_date(info.get("发行时间"))
+    return rec
+
+
+def columnar_type(kind: str):
+    if kind == "decimal":
+        return pa.decimal128(12, 2)
+    return pa.bool_() if kind == "bool" else getattr(pa, kind)()
+
+
+def save_columnar(items, path: str, fmt: str = "parquet") -> int:
+    """规范化后按列写出：`parquet`（zstd 压缩，字符串列字典编码）或 `arrow`（Arrow IPC 文件）。
+    写临时文件后原子替换；未安装 pyarrow 时跳过并提示。返回行数。
+    """
+    if not HAS_PYARROW:
+        print(f"未安装 pyarrow，跳过列式导出 {path}（uv sync --extra analytics）")
+        return 0
+    rows = [normalize_item(it, pos) for pos, it in enumerate(items)]
+    table = pa.table(
+        {
+            name: pa.array([r[name] for r in rows], type=columnar_type(kind))
+            for name, kind in TYPED_COLUMNS
+        }
+    )
+    tmp = path + ".tmp"
+    with METRICS.timer("write_columnar"):
+        if fmt == "arrow":
+            options = pa.ipc.IpcWriteOptions(
+                compression="zstd" if pa.Codec.is_available("zstd") else None
+            )
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as w:
+                w.write_table(table)
+        else:
+            pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+    invalid = sum(
+        1 for r in rows for col in ("pack_barcode_valid", "carton_barcode_valid") if r[col] is False
+    )
+    print(f"列式导出：{path}，{len(rows)} 行，{len(TYPED_COLUMNS)} 列，条码校验未通过 {invalid} 个")
+    return len(rows)
+
+
+def columnar_path(out_dir: str, stem: str) -> str | None:
+    fmt = EXPORT_CONFIG["columnar"]
+    return os.path.join(out_dir, f"{stem}.{fmt}") if fmt else None
+
+
+# 原始 HTML 归档：详情页正文按 URL 以 zlib 压缩存入 SQLite，抽取规则变化后用 `--action reparse` 离线重建输出
+class HtmlArchive:
+    """原始页面归档（`out/.run/html_archive.db`，二进制且体积大，不随输出提交）：每个 URL 一行，保存抓取时间、正文 sha1 与 zlib 压缩后的正文。
+    - 同一 URL 再次抓取时覆盖为最新版本，行顺序（rowid）保持首次抓取的顺序。
+    - 写入先缓冲、每 `batch` 条一个事务提交；详情 worker 多线程共享，内部加锁。
+    """
+
+    FILE_NAME = "html_archive.db"
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS pages (
+        url TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        sha1 TEXT NOT NULL,
+        body BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_pages_kind ON pages(kind);
+    """
+    UPSERT = (
+        "INSERT INTO pages (url, kind, fetched_at, sha1, body) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(url) DO UPDATE SET kind = excluded.kind, fetched_at = excluded.fetched_at, "
+        "sha1 = excluded.sha1, body = excluded.body"
+    )
+
+    def __init__(self, path: str, batch: int = SQLITE_BATCH):
+        self.path = path
+        self.batch = max(1, int(batch or 1))
+        self.count = 0
+        self._rows: list[tuple] = []
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def put(self, url: str, html: str, kind: str = "product"):
+        raw = html.encode("utf-8")
+        row = (url, kind, time.time(), hashlib.sha1(raw).hexdigest(), zlib.compress(raw, 6))
+        with self._lock:
+            self._rows.append(row)
+            self.count += 1
+            if len(self._rows) >= self.batch:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._rows:
+            with METRICS.timer("write_archive"), self.conn:
+                self.conn.executemany(self.UPSERT, self._rows)
+            self._rows = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self._flush_locked()
+                self.conn.close()
+                self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def read(path: str, kind: str = "product") -> list[tuple[str, bytes]]:
+        """按首次抓取顺序读出 `(url, 压缩正文)`，不解压（交给解析进程）。"""
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            return conn.execute(
+                "SELECT url, body FROM pages WHERE kind = ? ORDER BY rowid", (kind,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+
+REPARSE_CHUNK = 64
+
+
+def _parser_process_init(parser_config: dict):
+    # 子进程以 spawn 启动，不继承全局变量：沿用主进程的解析配置
+    PARSER.update(parser_config)
+
+
+def parser_process_pool(workers: int) -> ProcessPoolExecutor:
+    """解析进程池。使用 spawn 启动：主进程里有浏览器与指标线程，fork 可能继承被占用的锁。"""
+    return ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_parser_process_init,
+        initargs=(dict(PARSER),),
+    )
+
+
+def _reparse_rows(rows: list[tuple[str, bytes]]) -> list[tuple[str, dict, str]]:
+    out = []
+    for url, body in rows:
+        html = zlib.decompress(body).decode("utf-8")
+        item = build_item_from_soup(make_product_soup(html), url)
+        out.append((url, item, html_fingerprint(html)))
+    return out
 
 
 def parse_images(soup: BeautifulSoup, page_url: str) -> list:
@@ -195,8 +1331,11 @@ def clean_info_values(info: dict) -> dict:
     return cleaned
 
 
-def parse_product_names(soup: BeautifulSoup, title_text: str = "") -> dict:
-    h2 = soup.select_one(SELECTORS["product_title"])
+def parse_product_names(
+    soup: BeautifulSoup, title_text: str = "", h2=None
+) -> dict:
+    if h2 is None:
+        h2 = soup.select_one(SELECTORS["product_title"])
     out = {}
     if h2:
         zh = text_clean(h2.get_text(" "))
@@ -239,17 +1378,16 @@ KEYS_WHITELIST = [
 ]
 
 
-def extract_info(soup: BeautifulSoup) -> dict:
+def extract_info(soup: BeautifulSoup, h2=None, title_text: str | None = None) -> dict:
+    t0 = time.perf_counter()
     info: dict = {}
 
-    # 名称（精确路径）
-    h2 = soup.select_one(SELECTORS["product_title"])
-    title_text = (
-        text_clean(h2.get_text(" "))
-        if h2
-        else text_clean((soup.title.string if soup.title else "") or "")
-    )
-    info.update(parse_product_names(soup, title_text))
+    # 名称（精确路径）；调用方已定位标题节点时直接复用，避免重复查询
+    if h2 is None:
+        h2 = soup.select_one(SELECTORS["product_title"])
+    if title_text is None:
+        title_text = get_title_from_soup(soup, h2)
+    info.update(parse_product_names(soup, title_text, h2))
 
     # 详情参数（仅用路径，不做全文搜索）
     root = soup.select_one(SELECTORS["catalog_left_col"]) or soup
@@ -266,13 +1404,16 @@ def extract_info(soup: BeautifulSoup) -> dict:
             if val:
                 info[key] = val
 
-    return clean_info_values(info)
+    info = clean_info_values(info)
+    METRICS.observe("extract_info", time.perf_counter() - t0)
+    return info
 
 
 # 共享工具函数：标题解析、构建 item、通用等待与图片下载
 
-def get_title_from_soup(soup: BeautifulSoup) -> str:
-    h2 = soup.select_one(SELECTORS["product_title"])
+def get_title_from_soup(soup: BeautifulSoup, h2=None) -> str:
+    if h2 is None:
+        h2 = soup.select_one(SELECTORS["product_title"])
     return (
         text_clean(h2.get_text(" "))
         if h2
@@ -281,163 +1422,1585 @@ def get_title_from_soup(soup: BeautifulSoup) -> str:
 
 
 def build_item_from_soup(soup: BeautifulSoup, page_url: str) -> dict:
-    title = get_title_from_soup(soup)
-    values = extract_info(soup)
+    # 单次定位标题节点，标题/品名/参数提取共用
+    h2 = soup.select_one(SELECTORS["product_title"])
+    title = get_title_from_soup(soup, h2)
+    values = extract_info(soup, h2, title)
     images = parse_images(soup, page_url)
     return {"title": title, "url": page_url, "info": values, "images": images}
 
 
-def wait_for_selector_safe(page, selector: str, timeout: int = 15000):
+def wait_for_selector_safe(page, selector: str, timeout: int = 15000) -> bool:
+    """等待选择器出现；超时不抛异常，返回 False（退避交由 `RATE` 统一处理，不再固定等待）。
+    耗时记入 `METRICS`：成功为 `wait_selector`，超时为 `wait_selector_timeout`。
+    """
+    t0 = time.perf_counter()
     try:
         page.wait_for_load_state("domcontentloaded")
         page.wait_for_selector(selector, timeout=timeout)
+        METRICS.observe("wait_selector", time.perf_counter() - t0)
+        return True
     except PlaywrightTimeoutError:
-        page.wait_for_timeout(1200)
+        METRICS.observe("wait_selector_timeout", time.perf_counter() - t0)
+        return False
 
 
-def download_image(
-    session: requests.Session, img_url: str, out_dir_images: str
-) -> str | None:
-    try:
-        name = re.sub(
-            r"[^a-zA-Z0-9._-]",
-            "_",
-            urlparse(img_url).path.split("/")[-1] or "image.jpg",
-        )
-        path = os.path.join(out_dir_images, name)
-        if not os.path.exists(path):
-            r = session.get(img_url, timeout=30)
-            if r.status_code == 200:
-                with open(path, "wb") as f:
-                    f.write(r.content)
-        return path if os.path.exists(path) else None
-    except Exception as e:
-        print("图片下载异常", e)
-        return None
+# 自适应限速：全局令牌桶 + AIMD，所有抓取路径共用
+class RateController:
+    """跨线程共享的令牌桶限速器，速率按 AIMD 自适应调整。
+    - 每次请求前 `acquire()` 领取令牌；令牌不足时按当前速率排队等待（预约制，线程安全）。
+    - 请求结束后 `record()` 反馈耗时与结果：延迟低于 `target_latency` 且近期错误率低时加性提速；
+      超时、校验页或 5xx 时乘性降速（`cooldown` 秒内只降一次，避免并发失败叠加塌缩）。
+    - `summary()` 汇总实际达到的请求速率与退避次数。
+    """
 
+    def __init__(
+        self,
+        rate: float = 2.0,
+        min_rate: float = 0.2,
+        max_rate: float = 8.0,
+        target_latency: float = 3.0,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        cooldown: float = 2.0,
+    ):
+        self._lock = threading.Lock()
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.reset(rate, min_rate, max_rate)
 
-def download_images_for_items(items: list[dict], session: requests.Session, out_dir: str):
-    out_dir_images = os.path.join(out_dir, "images")
-    os.makedirs(out_dir_images, exist_ok=True)
-    for it in items:
-        imgs = it.get("images") or []
-        if not imgs:
-            continue
-        local = download_image(session, imgs[0], out_dir_images)
-        if local:
-            it["image_local"] = local
+    def reset(self, rate: float, min_rate: float, max_rate: float):
+        with self._lock:
+            self.max_rate = max(float(max_rate), 0.01)
+            self.min_rate = min(max(float(min_rate), 0.01), self.max_rate)
+            self.rate = min(max(float(rate), self.min_rate), self.max_rate)
+            self._tokens = 1.0
+            self._last = time.monotonic()
+            self._last_decrease = 0.0
+            self._err_ewma = 0.0
+            self.stats = {
+                "requests": 0,
+                "errors": 0,
+                "backoffs": {},
+                "waited": 0.0,
+                "min_rate": self.rate,
+                "max_rate": self.rate,
+                "started": None,
+                "finished": None,
+            }
 
+    def configure(self, delay: float, min_rate: float = 0.0, max_rate: float = 0.0):
+        """由 `--delay` 推导初始速率（1/delay）；未指定上下限时取初始速率的 4 倍与 1/10。"""
+        rate = 1.0 / delay if delay and delay > 0 else (max_rate or 10.0)
+        self.reset(rate, min_rate or rate / 10, max_rate or rate * 4)
 
-def crawl_with_playwright(
-    limit: int = None, delay: float = 0.5, out_dir: str = "etmoc_output"
-):
-    ensure_clean_out(out_dir)
-    items = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=HEADERS["User-Agent"])
-        page = context.new_page()
+    def reserve(self) -> float:
+        """领取一个令牌，返回需要等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(1.0, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.stats["requests"] += 1
+            self.stats["waited"] += wait
+            if self.stats["started"] is None:
+                self.stats["started"] = now
+            return wait
 
-        # 预置 cookie 并触发校验 URL
-        srcurl_hex = hex_str(f"{BASE}/Firms/BrandAll")
-        context.add_cookies(
-            [
-                {
-                    "name": "srcurl",
-                    "value": srcurl_hex,
-                    "domain": "www.etmoc.com",
-                    "path": "/",
-                }
-            ]
-        )
-        sv_hex = page.evaluate(
-            "(()=>{const s=`${screen.width},${screen.height}`;return Array.from(s).map(c=>c.charCodeAt(0).toString(16)).join('')})()"
-        )
-        page.goto(
-            f"{BASE}/Firms/BrandAll?security_verify_data={sv_hex}", wait_until="load"
-        )
-        page.wait_for_timeout(1500)
-        page.wait_for_load_state("networkidle")
-        brand_html = page.content()
-        with open(os.path.join(out_dir, "brand_all.html"), "w", encoding="utf-8") as f:
-            f.write(brand_html)
-        page.screenshot(path=os.path.join(out_dir, "brand_all.png"), full_page=True)
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
 
-        brand_hrefs = find_links(brand_html, r"(?i)BrandShow\?Id=\d+")
-        prod_hrefs = find_links(brand_html, r"(?i)Product\?Id=\d+")
-        brand_links = list(set(to_abs(page.url, brand_hrefs + prod_hrefs)))
-        if not brand_links:
-            print("品牌链接为空，页面可能仍受防护，稍后重试或增大等待时间。")
-            browser.close()
-            return
+    async def acquire_async(self):
+        """事件循环内领取令牌（图片下载）：排队等待时让出循环，不阻塞其他下载任务。"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
 
-        session = requests.Session()
-        session.headers.update(HEADERS)
-        cookies_to_requests(session, context.cookies())
+    def record(self, latency: float | None = None, ok: bool = True, reason: str = ""):
+        with self._lock:
+            now = time.monotonic()
+            self.stats["finished"] = now
+            self._err_ewma = 0.9 * self._err_ewma + (0.0 if ok else 0.1)
+            if ok:
+                if (latency is None or latency <= self.target_latency) and self._err_ewma < 0.1:
+                    self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                self.stats["errors"] += 1
+                key = reason or "error"
+                self.stats["backoffs"][key] = self.stats["backoffs"].get(key, 0) + 1
+                if now - self._last_decrease >= self.cooldown:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    self._last_decrease = now
+            self.stats["min_rate"] = min(self.stats["min_rate"], self.rate)
+            self.stats["max_rate"] = max(self.stats["max_rate"], self.rate)
 
-        product_urls = []
-        for b in brand_links:
-            if "Product?Id=" in b:
-                product_urls.append(b)
-                continue
-            page.goto(b, wait_until="load")
-            page.wait_for_load_state("networkidle")
-            bh = page.content()
-            product_urls.extend(
-                to_abs(page.url, find_links(bh, r"(?i)Product\?Id=\d+"))
-            )
-            time.sleep(delay)
-            if limit and len(product_urls) >= limit:
-                break
+    def summary(self) -> dict:
+        with self._lock:
+            st = dict(self.stats)
+            started, finished = st.pop("started"), st.pop("finished")
+            elapsed = (finished - started) if started and finished else 0.0
+            st["elapsed"] = elapsed
+            st["achieved_rate"] = st["requests"] / elapsed if elapsed > 0 else 0.0
+            st["current_rate"] = self.rate
+            return st
 
-        seen = set()
-        product_urls = [u for u in product_urls if not (u in seen or seen.add(u))]
-        if limit:
-            product_urls = product_urls[:limit]
-        pb = tqdm(
-            total=len(product_urls), desc="详情解析", unit="项", dynamic_ncols=True
+    def report(self):
+        st = self.summary()
+        backoffs = "，".join(f"{k} {v}" for k, v in st["backoffs"].items()) or "无"
+        print(
+            f"限速：请求 {st['requests']} 次，实际 {st['achieved_rate']:.2f} 次/秒，"
+            f"速率区间 {st['min_rate']:.2f}–{st['max_rate']:.2f}（当前 {st['current_rate']:.2f}），"
+            f"退避 {st['errors']} 次（{backoffs}），累计排队 {st['waited']:.1f}s"
         )
 
-        for i, pu in enumerate(product_urls, 1):
-            page.goto(pu, wait_until="load")
-            page.wait_for_load_state("networkidle")
-            ph = page.content()
-            soup = BeautifulSoup(ph, "html.parser")
-            it = build_item_from_soup(soup, pu)
-            items.append(it)
-            tqdm.write(f"[{i}/{len(product_urls)}] {it.get('title', '')}")
-            pb.update(1)
-            time.sleep(delay)
 
-        pb.close()
-        # 统一下载图片，避免解析阶段的网络阻塞
-        download_images_for_items(items, session, out_dir)
-        browser.close()
+RATE = RateController()
 
-    save_json(items, os.path.join(out_dir, "products_playwright.json"))
-    save_csv(items, os.path.join(out_dir, "products_playwright.csv"))
-    print(f"完成：{len(items)} 条，输出目录：{out_dir}")
 
+# 请求拦截：在浏览器上下文层屏蔽不需要的资源类型与 URL（统计/分享脚本等），可选捕获产品图片字节
+ROUTE_CONFIG = {
+    "enabled": True,
+    "resource_types": {"stylesheet", "font", "media", "image"},
+    "url_patterns": [
+        r"hm\.baidu\.com",
+        r"bdimg\.share\.baidu\.com",
+        r"/count/mystat",
+        r"google-analytics\.com",
+        r"cnzz\.com",
+    ],
+    "capture_images": False,
+    "capture_pattern": r"/firm/",
+}
+RESOURCE_GATES: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
 
-def wait_for_catalog_ready(page, timeout: int = 15000):
-    wait_for_selector_safe(page, SELECTORS["product_links_in_catalog"], timeout)
 
+class ResourceGate:
+    """浏览器上下文的请求拦截层。
+    - 屏蔽 `resource_types` 中的资源类型与匹配 `url_patterns` 的请求（`enabled=False` 时不拦截）。
+    - `capture_images` 时放行详情页中匹配 `capture_pattern` 的图片，经 `route.fetch` 取得字节后回填给页面，
+      并暂存供 `take_image` 取用，避免末尾再下载一次。
+    - 统计每次页面加载实际传输的字节数（`begin_page`/`end_page`），拦截开关均生效。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        resource_types=(),
+        url_patterns=(),
+        capture_images: bool = False,
+        capture_pattern: str = r"/firm/",
+        max_captured: int = 32,
+    ):
+        self.enabled = enabled
+        self.resource_types = set(resource_types)
+        self._url_rx = re.compile("|".join(url_patterns)) if url_patterns else None
+        self.capture_images = capture_images
+        self._capture_rx = re.compile(capture_pattern)
+        self.capturing = False
+        self.blocked = 0
+        self._captured: OrderedDict = OrderedDict()
+        self._max_captured = max_captured
+        self._page_bytes = 0
+        self._page_blocked = 0
+
+    @classmethod
+    def from_config(cls) -> "ResourceGate":
+        return cls(
+            enabled=ROUTE_CONFIG["enabled"],
+            resource_types=ROUTE_CONFIG["resource_types"],
+            url_patterns=ROUTE_CONFIG["url_patterns"],
+            capture_images=ROUTE_CONFIG["capture_images"],
+            capture_pattern=ROUTE_CONFIG["capture_pattern"],
+        )
+
+    def install(self, context):
+        if self.enabled or self.capture_images:
+            context.route("**/*", self._on_route)
+        context.on("requestfinished", self._on_finished)
+        RESOURCE_GATES[context] = self
+
+    def _on_route(self, route):
+        req = route.request
+        if (
+            self.capturing
+            and self.capture_images
+            and req.resource_type == "image"
+            and self._capture_rx.search(req.url)
+        ):
+            # 只有 fetch 失败时才回退拦截/放行；fetch 成功后路由已交给 fulfill，不能再 abort/continue
+            try:
+                resp = route.fetch()
+                body = resp.body()
+            except Exception:
+                resp = None
+            if resp is not None:
+                if resp.ok:
+                    self._captured[req.url] = body
+                    while len(self._captured) > self._max_captured:
+                        self._captured.popitem(last=False)
+                route.fulfill(response=resp, body=body)
+                return
+        if self.enabled and (
+            req.resource_type in self.resource_types
+            or (self._url_rx is not None and self._url_rx.search(req.url))
+        ):
+            self.blocked += 1
+            route.abort()
+            return
+        route.continue_()
+
+    def _on_finished(self, request):
+        try:
+            sizes = request.sizes()
+            self._page_bytes += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    def begin_page(self):
+        self._page_bytes = 0
+        self._page_blocked = self.blocked
+
+    def end_page(self) -> tuple[int, int]:
+        return self._page_bytes, self.blocked - self._page_blocked
+
+    def take_image(self, url: str) -> bytes | None:
+        return self._captured.pop(url, None)
+
+    def take_images(self) -> dict[str, bytes]:
+        """取出全部已捕获的图片字节（流水线模式下随抓取结果交给解析后的收尾阶段）。"""
+        out = dict(self._captured)
+        self._captured.clear()
+        return out
+
+
+class PageLoadLog:
+    """逐 URL 记录浏览器页面加载的传输字节与耗时，用于对比拦截层开/关的效果。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records: list[dict] = []
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def record(self, url: str, nbytes: int, seconds: float, blocked: int):
+        with self._lock:
+            self.records.append(
+                {"url": url, "bytes": nbytes, "ms": round(seconds * 1000, 1), "blocked": blocked}
+            )
+
+    def summary(self) -> dict:
+        with self._lock:
+            n = len(self.records)
+            total = sum(r["bytes"] for r in self.records)
+            ms = sum(r["ms"] for r in self.records)
+            blocked = sum(r["blocked"] for r in self.records)
+        return {
+            "blocking": ROUTE_CONFIG["enabled"],
+            "pages": n,
+            "total_bytes": total,
+            "avg_bytes": total / n if n else 0.0,
+            "avg_ms": ms / n if n else 0.0,
+            "blocked_requests": blocked,
+        }
 
-def wait_for_product_ready(page, timeout: int = 15000):
-    wait_for_selector_safe(page, SELECTORS["wait_product_ready"], timeout)
+    def report(self, out_dir: str | None = None):
+        st = self.summary()
+        if not st["pages"]:
+            return
+        print(
+            f"页面加载（拦截{'开' if st['blocking'] else '关'}）：{st['pages']} 页，"
+            f"平均 {st['avg_bytes'] / 1024:.1f} KiB / {st['avg_ms']:.0f} ms，拦截请求 {st['blocked_requests']} 个"
+        )
+        if out_dir:
+            with self._lock:
+                pages = list(self.records)
+            save_json({"summary": st, "pages": pages}, run_path(out_dir, "pageload_stats.json"))
+
+
+PAGELOAD = PageLoadLog()
+
+
+# 选择器驱动的就绪判定：抽取所需的节点齐全即返回，不再等待 load/networkidle；
+# 每种页面的超时按观测到的就绪耗时分位数自适应
+READY_PROFILES = {
+    # 页面类型: (必需选择器, 可选选择器)，取 SELECTORS 的键；
+    # 必需节点均已出现，且可选节点也齐全或文档已加载完成（再等也不会出现）即视为就绪
+    "product": (("product_title",), ("pro_bar", "image")),
+    "catalog": (("product_links_in_catalog",), ("total_pages_anchor",)),
+    "brand": ((), ("brand_product_links",)),
+    "brand_all": (("brand_links",), ()),
+}
+READY_CONFIG = {
+    "default_timeout": 15000,  # 样本不足时的超时（毫秒）
+    "min_timeout": 3000,
+    "max_timeout": 15000,
+    "warmup": 20,  # 某类页面累计成功次数达到该值后启用自适应超时
+    "factor": 3.0,  # 自适应超时 = p99 就绪耗时 × factor，限定在 [min_timeout, max_timeout]
+    "audit_every": 25,  # 每类页面每 N 次就绪抽查一次 networkidle 的额外耗时，0 表示不抽查
+}
+READY_JS = """([required, optional]) => {
+    const has = (s) => document.querySelector(s) !== null;
+    if (!required.every(has)) return false;
+    if (optional.every(has)) return "data";
+    return document.readyState === "complete" ? "load" : false;
+}"""
+
+
+class ReadinessEngine:
+    """按页面类型（`READY_PROFILES`）等待抽取所需节点，跨线程共享。
+    - 结果分为 `data`（必需与可选节点齐全）、`load`（文档加载完成时可选节点仍缺失）与 `timeout`。
+    - 超时：某类页面成功样本达到 `warmup` 后取 p99 × `factor`，否则用 `default_timeout`。
+    - 抽查：每 `audit_every` 次就绪后继续等待 networkidle，记录其比就绪晚多少，用于估计节省的等待时间。
+    - `report(out_dir)` 打印各类页面的结果与估计节省，并写出 `out/.run/readiness.json`。
+    """
+
+    def __init__(self, max_samples: int = 500):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.kinds: dict[str, dict] = {}
+
+    def _kind(self, kind: str) -> dict:
+        st = self.kinds.get(kind)
+        if st is None:
+            st = self.kinds[kind] = {
+                "data": 0,
+                "load": 0,
+                "timeout": 0,
+                "samples": deque(maxlen=self.max_samples),
+                "audits": [],
+            }
+        return st
+
+    def timeout_ms(self, kind: str) -> int:
+        with self._lock:
+            samples = sorted(self._kind(kind)["samples"])
+        if len(samples) < READY_CONFIG["warmup"]:
+            return READY_CONFIG["default_timeout"]
+        t = percentile(samples, 0.99) * 1000 * READY_CONFIG["factor"]
+        return int(min(READY_CONFIG["max_timeout"], max(READY_CONFIG["min_timeout"], t)))
+
+    def wait(self, page, kind: str, timeout: int | None = None) -> bool:
+        """等待 `kind` 类页面就绪；超时不抛异常，返回 False。耗时记入 `METRICS` 的 `ready`/`ready_timeout`。"""
+        required, optional = READY_PROFILES[kind]
+        args = [[SELECTORS[k] for k in required], [SELECTORS[k] for k in optional]]
+        limit = timeout or self.timeout_ms(kind)
+        t0 = time.perf_counter()
+        try:
+            outcome = page.wait_for_function(READY_JS, arg=args, timeout=limit).json_value()
+        except PlaywrightTimeoutError:
+            elapsed = time.perf_counter() - t0
+            METRICS.observe("ready_timeout", elapsed)
+            with self._lock:
+                self._kind(kind)["timeout"] += 1
+            return False
+        elapsed = time.perf_counter() - t0
+        METRICS.observe("ready", elapsed)
+        with self._lock:
+            st = self._kind(kind)
+            st[outcome] += 1
+            st["samples"].append(elapsed)
+            every = READY_CONFIG["audit_every"]
+            audit = bool(every) and (st["data"] + st["load"]) % every == 0
+        if audit:
+            self._audit(page, kind)
+        return True
+
+    def _audit(self, page, kind: str):
+        t0 = time.perf_counter()
+        try:
+            page.wait_for_load_state("networkidle", timeout=READY_CONFIG["max_timeout"])
+        except PlaywrightTimeoutError:
+            return
+        with self._lock:
+            self._kind(kind)["audits"].append(time.perf_counter() - t0)
+
+    def summary(self) -> dict:
+        out = {}
+        with self._lock:
+            kinds = {k: (dict(v), sorted(v["samples"]), list(v["audits"])) for k, v in self.kinds.items()}
+        for kind, (st, samples, audits) in kinds.items():
+            ready = st["data"] + st["load"]
+            saved_avg = sum(audits) / len(audits) if audits else 0.0
+            out[kind] = {
+                "ready_data": st["data"],
+                "ready_load": st["load"],
+                "timeouts": st["timeout"],
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+                "timeout_ms": self.timeout_ms(kind),
+                "audits": len(audits),
+                "networkidle_extra_avg_ms": round(saved_avg * 1000, 1),
+                # 抽查样本外推：全部就绪页面若改等 networkidle 需多花的时间
+                "estimated_saved_s": round(saved_avg * ready, 1),
+            }
+        return out
+
+    def report(self, out_dir: str | None = None):
+        st = self.summary()
+        if not st:
+            return
+        for kind, k in st.items():
+            line = (
+                f"就绪判定 {kind}：节点齐全 {k['ready_data']}，加载完成 {k['ready_load']}，超时 {k['timeouts']}；"
+                f"p50 {k['p50_ms']:.0f} ms / p95 {k['p95_ms']:.0f} ms，当前超时 {k['timeout_ms']} ms"
+            )
+            if k["audits"]:
+                line += (
+                    f"；抽查 {k['audits']} 次 networkidle 平均再晚 {k['networkidle_extra_avg_ms']:.0f} ms，"
+                    f"估计节省 {k['estimated_saved_s']:.1f}s"
+                )
+            print(line)
+        if out_dir:
+            save_json(st, run_path(out_dir, "readiness.json"))
+
+
+READINESS = ReadinessEngine()
+
+
+PAGE_TIMEOUT_MS = 45000
+
+
+def configure_page(page):
+    """新页面的公共设置（导航与操作超时），返回页面本身。"""
+    page.set_default_navigation_timeout(PAGE_TIMEOUT_MS)
+    page.set_default_timeout(PAGE_TIMEOUT_MS)
+    return page
+
+
+def new_browser_context(browser, storage_state: dict | None = None):
+    """创建统一 UA 的浏览器上下文，安装请求拦截层（见 `ROUTE_CONFIG`），并注入已校验的会话状态。"""
+    context = browser.new_context(
+        user_agent=HEADERS["User-Agent"], storage_state=storage_state
+    )
+    ResourceGate.from_config().install(context)
+    return context
+
+
+# 浏览器回收：长时间运行时按导航次数或进程树常驻内存上限回收页面/上下文，
+# 已校验的 cookie 随 storage_state 带入新上下文，每次回收前后的内存记入 `RECYCLES`
+RECYCLE_CONFIG = {
+    "navigations": 0,  # 同一页面/上下文导航 N 次后回收；0 表示不按次数回收
+    "rss_mb": 0,  # 页面所属浏览器的进程树常驻内存超过该值（MiB）时回收；0 表示不检查
+    "rss_check_every": 10,  # 每 N 次导航检查一次内存（扫描 /proc 有少量开销）
+}
+
+
+def _proc_children() -> dict[int, list[int]] | None:
+    """按 /proc 建立 ppid → 子进程列表；没有 /proc 的平台返回 None。"""
+    children: dict[int, list[int]] = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return None
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # 进程名可能含空格与括号，ppid 取最后一个 ')' 之后的第二个字段
+        ppid = int(stat[stat.rindex(b")") + 2 :].split()[1])
+        children.setdefault(ppid, []).append(int(name))
+    return children
+
+
+def _descendants(children: dict[int, list[int]], root: int) -> list[int]:
+    pids, stack = [], [root]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return pids
+
+
+def process_tree_rss_mb(root_pid: int | None = None) -> float | None:
+    """进程 `root_pid`（默认本进程）及其全部子孙进程的常驻内存合计（MiB）。
+    按 /proc 统计，进程间共享的页面会重复计入，数值偏保守；没有 /proc 或进程已退出时返回 None。
+    """
+    children = _proc_children()
+    root = root_pid or os.getpid()
+    if children is None or not os.path.exists(f"/proc/{root}"):
+        return None
+    page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+    total = 0
+    for pid in _descendants(children, root):
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                total += int(f.read().split()[1]) * page_kib
+        except (OSError, ValueError, IndexError):
+            pass
+    return total / 1024
+
+
+def browser_process_pid(info: dict) -> int | None:
+    """从 CDP `SystemInfo.getProcessInfo` 的结果取浏览器主进程 pid；须是本进程的子孙，否则返回 None。"""
+    pid = next((int(p["id"]) for p in info.get("processInfo", []) if p.get("type") == "browser"), None)
+    children = _proc_children()
+    if pid is None or children is None or pid not in _descendants(children, os.getpid()):
+        return None
+    return pid
+
+
+def browser_pid(browser) -> int | None:
+    """查询浏览器主进程 pid，内存检查只统计该浏览器的进程树（不含其他 worker 的浏览器与解析进程）。
+    未设置内存上限、非 Chromium 或查询失败时返回 None，此时按本进程的整个进程树统计。
+    """
+    if not RECYCLE_CONFIG["rss_mb"]:
+        return None
+    try:
+        cdp = browser.new_browser_cdp_session()
+        try:
+            return browser_process_pid(cdp.send("SystemInfo.getProcessInfo"))
+        finally:
+            cdp.detach()
+    except Exception:
+        return None
+
+
+class RecycleLog:
+    """记录每次回收的原因、回收前的导航次数与前后内存，以及检查到的峰值内存，用于估算 runner 规格。
+    `report(out_dir)` 打印汇总并写出 `out/.run/recycle_log.json`。
+    """
 
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
 
-def get_total_pages_number(page, root_url: str, timeout: int = 15000) -> int:
+    def reset(self):
+        with self._lock:
+            self.records: list[dict] = []
+            self.peak_mb = 0.0
+            self.process_mb = None
+
+    def observe(self, rss_mb: float | None):
+        if rss_mb is not None:
+            with self._lock:
+                self.peak_mb = max(self.peak_mb, rss_mb)
+
+    def record(
+        self, kind: str, reason: str, navigations: int, before_mb: float | None, after_mb: float | None
+    ) -> bool:
+        """记录一次回收；按内存回收后仍不低于上限时返回 True，调用方应停止对该浏览器按内存回收。"""
+        self.observe(before_mb)
+        rec = {
+            "at": round(time.time(), 1),
+            "kind": kind,
+            "reason": reason,
+            "navigations": navigations,
+            "rss_before_mb": round(before_mb, 1) if before_mb is not None else None,
+            "rss_after_mb": round(after_mb, 1) if after_mb is not None else None,
+        }
+        with self._lock:
+            self.records.append(rec)
+        delta = (
+            f"（{after_mb - before_mb:+.0f} MiB）" if before_mb is not None and after_mb is not None else ""
+        )
+        tqdm.write(
+            f"回收浏览器上下文（{'内存超限' if reason == 'rss' else '导航次数'}，"
+            f"已导航 {navigations} 次）：内存 {rec['rss_before_mb']} → {rec['rss_after_mb']} MiB{delta}"
+        )
+        if reason == "rss" and after_mb is not None and after_mb >= RECYCLE_CONFIG["rss_mb"]:
+            tqdm.write("回收后内存仍高于上限（--rss-ceiling 可能低于浏览器的基础占用），该浏览器不再按内存回收。")
+            return True
+        return False
+
+    def summary(self) -> dict:
+        with self._lock:
+            records = list(self.records)
+            peak = self.peak_mb
+        after = [r["rss_after_mb"] for r in records if r["rss_after_mb"] is not None]
+        return {
+            "recycles": len(records),
+            "by_reason": {
+                reason: sum(1 for r in records if r["reason"] == reason) for reason in ("navigations", "rss")
+            },
+            "peak_rss_mb": round(peak, 1),
+            "baseline_rss_mb": round(min(after), 1) if after else None,
+            "process_rss_mb": round(self.process_mb, 1) if self.process_mb is not None else None,
+            "config": dict(RECYCLE_CONFIG),
+            "records": records,
+        }
+
+    def report(self, out_dir: str | None = None):
+        # 峰值与前后内存按各自浏览器统计；结束时另记本进程整棵进程树的内存，供估算 runner 规格
+        self.process_mb = process_tree_rss_mb()
+        st = self.summary()
+        if not st["recycles"] and not (RECYCLE_CONFIG["navigations"] or RECYCLE_CONFIG["rss_mb"]):
+            return
+        print(
+            f"浏览器回收：{st['recycles']} 次（导航次数 {st['by_reason']['navigations']}，"
+            f"内存超限 {st['by_reason']['rss']}），峰值内存 {st['peak_rss_mb']:.0f} MiB"
+            + (f"，回收后最低 {st['baseline_rss_mb']:.0f} MiB" if st["baseline_rss_mb"] is not None else "")
+            + (f"；结束时进程树 {st['process_rss_mb']:.0f} MiB" if st["process_rss_mb"] is not None else "")
+        )
+        if out_dir:
+            save_json(st, run_path(out_dir, "recycle_log.json"))
+
+
+RECYCLES = RecycleLog()
+
+
+def recycle_reason(navigations: int, root_pid: int | None = None, check_rss: bool = True) -> str | None:
+    """按 `RECYCLE_CONFIG` 判断已导航 `navigations` 次的页面/上下文是否应回收：`navigations`、`rss` 或 None。
+    内存按浏览器主进程 `root_pid` 的进程树统计（None 时为本进程的整个进程树）；`check_rss` 为 False 时不检查内存。
+    """
+    limit = RECYCLE_CONFIG["navigations"]
+    if limit and navigations >= limit:
+        return "navigations"
+    every = max(1, int(RECYCLE_CONFIG["rss_check_every"] or 1))
+    if check_rss and RECYCLE_CONFIG["rss_mb"] and navigations and navigations % every == 0:
+        rss = process_tree_rss_mb(root_pid)
+        RECYCLES.observe(rss)
+        if rss is not None and rss >= RECYCLE_CONFIG["rss_mb"]:
+            return "rss"
+    return None
+
+
+class ManagedPage:
+    """可回收的浏览器页面：属性与方法转发给当前的 Playwright 页面，调用方持有的引用在回收后仍然有效。
+    - `browser_get` 每次导航前调用 `before_navigation`，满足 `recycle_reason` 时先 `recycle`：
+      取当前上下文的 storage_state（含已校验的 cookie），关闭旧上下文，用它新建上下文与页面。
+    - 内存只统计本页面所属浏览器的进程树；按内存回收后仍超限时，该页面不再按内存回收。
+    - 拦截层随新上下文重新安装，进行中的图片捕获开关一并带过去。
+    - 调用方应经 `page.context` 取当前上下文，不要长期持有旧的上下文对象。
+    """
+
+    def __init__(self, browser, storage_state: dict | None = None):
+        self._browser = browser
+        self._page = None
+        self.navigations = 0
+        self.browser_pid = browser_pid(browser)
+        self.rss_paused = False
+        self._open(storage_state)
+
+    def _open(self, storage_state: dict | None):
+        self._page = configure_page(new_browser_context(self._browser, storage_state).new_page())
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+    def before_navigation(self):
+        reason = recycle_reason(self.navigations, self.browser_pid, not self.rss_paused)
+        if reason is not None:
+            self.recycle(reason)
+        self.navigations += 1
+
+    def recycle(self, reason: str = "navigations"):
+        before = process_tree_rss_mb(self.browser_pid)
+        old = self._page.context
+        old_gate = RESOURCE_GATES.get(old)
+        state = old.storage_state()
+        try:
+            old.close()
+        except Exception as e:
+            tqdm.write(f"关闭旧浏览器上下文失败: {e}")
+        self._open(state)
+        gate = RESOURCE_GATES.get(self._page.context)
+        if old_gate is not None and gate is not None:
+            gate.capturing = old_gate.capturing
+        after = process_tree_rss_mb(self.browser_pid)
+        if RECYCLES.record("context", reason, self.navigations, before, after):
+            self.rss_paused = True
+        self.navigations = 0
+
+
+# 会话状态复用：校验通过后的 storage_state（cookie + localStorage）落盘，跨运行、worker 与调试脚本复用，
+# 仅在遇到校验页时重新校验
+SESSION_CONFIG = {
+    "state_path": os.path.join(".etmoc_state", "browser_state.json"),
+    "ttl": 6 * 3600,  # 会话 cookie 无到期时间，按此秒数视为有效
+    "reuse": True,
+}
+SESSION_STATS = {"verified": 0, "reused": 0}
+_SESSION_LOCK = threading.Lock()
+SCREEN_HEX_JS = "(()=>{const s=`${screen.width},${screen.height}`;return Array.from(s).map(c=>c.charCodeAt(0).toString(16)).join('')})()"
+
+
+def site_domain() -> str:
+    """站点 cookie 所属域名，由 `BASE` 推导。"""
+    return urlparse(BASE).hostname or ""
+
+
+def load_session_state() -> dict | None:
+    """读取已保存的会话状态；文件缺失、损坏、已过期（预留 60 秒）或 `reuse` 关闭时返回 None。"""
+    path = SESSION_CONFIG["state_path"]
+    if not SESSION_CONFIG["reuse"] or not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if float(data.get("expires_at") or 0) <= time.time() + 60:
+        return None
+    state = data.get("storage_state")
+    if not isinstance(state, dict) or not state.get("cookies"):
+        return None
+    return state
+
+
+def save_session_state(context) -> dict:
+    """把上下文的 storage_state 连同保存时间、到期时间原子写盘并返回。
+    到期时间取各持久 cookie 中最早的到期时刻，且不晚于保存时间 + `ttl`。
+    """
+    state = context.storage_state()
+    path = SESSION_CONFIG["state_path"]
+    if not path:
+        return state
+    now = time.time()
+    expiries = [
+        c["expires"] for c in state.get("cookies", []) if (c.get("expires") or -1) > 0
+    ]
+    expires_at = min(expiries + [now + SESSION_CONFIG["ttl"]])
+    with _SESSION_LOCK:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_json(
+            {"saved_at": now, "expires_at": expires_at, "storage_state": state}, path
+        )
+    return state
+
+
+def verify_session(page) -> bool:
+    """执行站点访问校验：预置 srcurl cookie，以屏幕尺寸的十六进制串访问 BrandAll 校验地址并等待网络空闲。
+    校验成功后写回会话状态；返回页面是否已脱离校验页。
+    """
+    page.context.add_cookies(
+        [
+            {
+                "name": "srcurl",
+                "value": hex_str(f"{BASE}/Firms/BrandAll"),
+                "domain": site_domain(),
+                "path": "/",
+            }
+        ]
+    )
+    try:
+        sv_hex = page.evaluate(SCREEN_HEX_JS)
+    except Exception:
+        sv_hex = hex_str("1280,900")
+    browser_get(
+        page,
+        f"{BASE}/Firms/BrandAll?security_verify_data={sv_hex}",
+        wait_for_network_idle,
+        wait_until="load",
+        reverify=False,
+    )
+    with _SESSION_LOCK:
+        SESSION_STATS["verified"] += 1
+    if is_challenge_html(page_html(page)):
+        print("校验后仍停留在校验页，本次不保存会话状态。")
+        return False
+    save_session_state(page.context)
+    return True
+
+
+def open_verified_context(browser, storage_state: dict | None = None):
+    """创建已通过校验的上下文与页面：优先使用传入的或磁盘上未过期的会话状态，否则现场执行 `verify_session`。
+    返回 `(context, page, reused)`；reused 表示本次未做校验。页面为 `ManagedPage`，
+    按 `RECYCLE_CONFIG` 回收时会换用新上下文，返回的 context 仅代表初始上下文，之后请用 `page.context`。
+    """
+    state = storage_state or load_session_state()
+    page = ManagedPage(browser, state)
+    context = page.context
+    if state:
+        with _SESSION_LOCK:
+            SESSION_STATS["reused"] += 1
+        return context, page, True
+    verify_session(page)
+    return context, page, False
+
+
+def report_first_product(t_start: float, reused: bool):
+    """打印自任务开始到写出首个产品的耗时（衡量会话复用带来的启动收益）。"""
+    tqdm.write(
+        f"首个产品耗时 {time.monotonic() - t_start:.1f}s"
+        f"（会话：{'复用已保存状态' if reused else '现场校验'}）"
+    )
+
+
+def save_image_bytes(out_dir: str, img_url: str, body: bytes) -> str:
+    """把已取得的图片字节存入内容寻址的 `out/images/`（清单中已有该 URL 时不重复写入），
+    末尾下载阶段据清单跳过。
+    """
+    store = open_image_store(out_dir)
+    path = store.local_path(img_url)
+    if path is None:
+        with METRICS.timer("write_image"):
+            path = store.put_bytes(img_url, body)
+    return path
+
+
+def browser_get(
+    page,
+    url: str,
+    ready=None,
+    wait_until: str = "domcontentloaded",
+    reverify: bool = True,
+) -> bool:
+    """限速后用浏览器打开页面并等待就绪，把耗时与结果反馈给 `RATE`，传输字节与耗时记入 `PAGELOAD`。
+    `ready(page) -> bool` 为就绪检查；跳转超时返回 False，就绪超时仍返回 True（保留已加载内容）。
+    就绪超时且页面为校验页时（`reverify`），重新校验会话后重试一次。
+    `ManagedPage` 在导航前按 `RECYCLE_CONFIG` 检查是否需要回收上下文。
+    """
+    if isinstance(page, ManagedPage):
+        page.before_navigation()
+    gate = RESOURCE_GATES.get(page.context)
+    if gate is not None:
+        gate.begin_page()
+    RATE.acquire()
+    t0 = time.monotonic()
+    try:
+        with METRICS.timer("goto"):
+            resp = page.goto(url, wait_until=wait_until)
+    except PlaywrightTimeoutError:
+        RATE.record(time.monotonic() - t0, ok=False, reason="timeout")
+        return False
+    status = resp.status if resp is not None else 200
+    is_ready = ready(page) if ready else True
+    latency = time.monotonic() - t0
+    challenged = status < 500 and not is_ready and reverify and is_challenge_html(page_html(page))
+    record_navigation(url, gate, status, is_ready, latency, challenged)
+    if challenged:
+        # 已保存的会话失效：重新校验（并写回状态）后重试
+        tqdm.write(f"遇到访问校验页，重新校验会话：{url}")
+        verify_session(page)
+        return browser_get(page, url, ready, wait_until, reverify=False)
+    return True
+
+
+def record_navigation(url: str, gate, status: int, is_ready: bool, latency: float, challenged: bool = False):
+    """把一次浏览器导航的结果记入 `PAGELOAD`（传输字节与拦截数）与 `RATE`（5xx、校验页、就绪超时视为失败）。"""
+    if gate is not None:
+        nbytes, blocked = gate.end_page()
+        PAGELOAD.record(url, nbytes, latency, blocked)
+    if status >= 500:
+        RATE.record(latency, ok=False, reason=f"http {status}")
+    elif challenged:
+        RATE.record(latency, ok=False, reason="challenge")
+    elif not is_ready:
+        RATE.record(latency, ok=False, reason="timeout")
+    else:
+        RATE.record(latency)
+
+
+# HTTP 快速通道：校验通过后直接用 requests 会话拉取 HTML，识别到校验页/空页时回退浏览器
+FETCH_MODES = ("browser", "http")
+CHALLENGE_MARKERS = ("security_verify_data", "srcurl")
+FETCH_STATS = {"http": 0, "browser_fallback": 0}
+_FETCH_STATS_LOCK = threading.Lock()
+
+
+def count_fetch(kind: str):
+    """只计数快速通道命中/回退；限速反馈由 `record_http_status` 负责（回退也可能源于 404、空页等非施压情形）。"""
+    with _FETCH_STATS_LOCK:
+        FETCH_STATS[kind] = FETCH_STATS.get(kind, 0) + 1
+
+
+def http_get_html(session: requests.Session, url: str, timeout: int = 20) -> str | None:
+    """限速后经 HTTP 会话获取页面；耗时、超时、5xx 与校验页经 `record_http_status` 反馈给 `RATE`。
+    非 200 时返回 None；校验页照常返回，由调用方回退浏览器。
+    """
+    RATE.acquire()
+    t0 = time.monotonic()
+    try:
+        with METRICS.timer("http_get"):
+            r = session.get(url, timeout=timeout)
+    except requests.Timeout:
+        RATE.record(time.monotonic() - t0, ok=False, reason="timeout")
+        return None
+    except requests.RequestException:
+        RATE.record(time.monotonic() - t0, ok=False, reason="error")
+        return None
+    latency = time.monotonic() - t0
+    html = None
+    if r.status_code == 200:
+        # 站点声明 utf-8；响应头缺少 charset 时 requests 会回退到 ISO-8859-1
+        if not r.encoding or r.encoding.lower() == "iso-8859-1":
+            r.encoding = "utf-8"
+        html = r.text
+    if not record_http_status(r.status_code, latency, html):
+        return None
+    return html
+
+
+def record_http_status(status: int, latency: float, html: str | None = None) -> bool:
+    """把 HTTP 响应反馈给 `RATE`：5xx 与正文含校验标记（`CHALLENGE_MARKERS`）视为施压信号，
+    其余（含 404、空页）按正常响应计。返回正文是否可用（仅 200）。
+    """
+    if status >= 500:
+        RATE.record(latency, ok=False, reason=f"http {status}")
+        return False
+    if has_challenge_markers(html):
+        RATE.record(latency, ok=False, reason="challenge")
+    else:
+        RATE.record(latency)
+    return status == 200
+
+
+def has_challenge_markers(html: str | None) -> bool:
+    """正文是否确为访问校验页（含 `CHALLENGE_MARKERS`）；空页、缺页不算。"""
+    return bool(html) and any(m in html for m in CHALLENGE_MARKERS)
+
+
+def is_challenge_html(html: str | None) -> bool:
+    """判断 HTML 是否为访问校验页或空页（需回退浏览器处理）。"""
+    if not html or not html.strip():
+        return True
+    return has_challenge_markers(html)
+
+
+def is_product_html(html: str | None) -> bool:
+    """快速通道取到的是否为可直接解析的详情页（非校验页且含标题块）。"""
+    return not is_challenge_html(html) and 'class="brand-title"' in html
+
+
+def fetch_soup_via_http(
+    session: requests.Session | None, url: str, scope: str
+) -> BeautifulSoup | None:
+    """通过 HTTP 会话获取页面并按 `scope`（product/catalog）解析；
+    页面为校验页、空页或缺少关键节点时返回 None。
+    """
+    if session is None:
+        return None
+    html = http_get_html(session, url)
+    if is_challenge_html(html):
+        return None
+    if scope == "product":
+        soup = make_product_soup(html)
+        ready = soup.select_one(SELECTORS["product_title"])
+    else:
+        soup = make_soup(html, scope)
+        ready = select_catalog_anchors(soup)
+    return soup if ready else None
+
+
+def image_file_name(img_url: str) -> str:
+    """旧版平铺布局的文件名（URL 末段），仅用于把旧图片导入 `ImageStore`。"""
+    return re.sub(
+        r"[^a-zA-Z0-9._-]",
+        "_",
+        urlparse(img_url).path.split("/")[-1] or "image.jpg",
+    )
+
+
+def image_ext(img_url: str) -> str:
+    ext = os.path.splitext(urlparse(img_url).path)[1].lower()
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,5}", ext) else ".jpg"
+
+
+IMAGE_CONFIG = {"revalidate": False}  # True 时对已有图片发条件请求（If-None-Match / If-Modified-Since）
+IMAGE_HASH_NAME = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]{1,5})$")
+
+
+class ImageStore:
+    """内容寻址的图片库：文件存为 `out/images/<h[0:2]>/<h[2:4]>/<sha256><扩展名>`，相同字节只存一份，
+    不同产品的同名图片不再互相覆盖。
+    - 清单 `out/image_manifest.json`：图片 URL → 哈希、大小、相对路径与 ETag/Last-Modified；
+      每条一行、按 URL 排序，只有字节或校验信息变化时才重写，未变化的图片不产生提交差异。
+    - 某 URL 的内容变化后，不再被任何 URL 引用的旧文件在 `save` 时删除。
+    - 清单中没有的 URL 若存在旧版平铺文件 `images/<文件名>`，先导入（移动）到内容寻址路径，不再重新下载。
+    """
+
+    MANIFEST = "image_manifest.json"
+
+    def __init__(self, out_dir: str):
+        self.root = os.path.join(out_dir, "images")
+        self.path = os.path.join(out_dir, self.MANIFEST)
+        self.entries: dict[str, dict] = {}
+        self.dirty = False
+        self._orphans: set[str] = set()
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = dict(json.load(f).get("images", {}))
+
+    @staticmethod
+    def rel_path(digest: str, ext: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def abs_path(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split("/"))
+
+    def local_path(self, url: str) -> str | None:
+        """清单中有记录且文件存在时返回本地路径。"""
+        with self._lock:
+            entry = self.entries.get(url)
+        if entry:
+            path = self.abs_path(entry["path"])
+            if os.path.exists(path):
+                return path
+        return None
+
+    def validators(self, url: str) -> dict:
+        """条件请求头：清单中记录的 ETag / Last-Modified。"""
+        with self._lock:
+            entry = self.entries.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def temp_file(self) -> tuple[int, str]:
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkstemp(dir=self.root, prefix=".", suffix=".part")
+
+    def commit(
+        self,
+        url: str,
+        tmp: str,
+        digest: str,
+        size: int,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> str:
+        """把写好的临时文件落位到内容地址并更新清单；同样的内容已存在时丢弃临时文件。返回本地路径。"""
+        rel = self.rel_path(digest, image_ext(url))
+        dst = self.abs_path(rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.exists(dst):
+            os.remove(tmp)
+        else:
+            # mkstemp 默认 0600，改为常规文件权限再落位
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, dst)
+        self.record(
+            url,
+            {"hash": digest, "size": size, "path": rel, "etag": etag, "last_modified": last_modified},
+        )
+        return dst
+
+    def record(self, url: str, entry: dict):
+        with self._lock:
+            old = self.entries.get(url)
+            if old == entry:
+                return
+            if old and old["path"] != entry["path"]:
+                self._orphans.add(old["path"])
+            self.entries[url] = entry
+            self.dirty = True
+
+    def put_bytes(self, url: str, body: bytes) -> str:
+        fd, tmp = self.temp_file()
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        return self.commit(url, tmp, hashlib.sha256(body).hexdigest(), len(body))
+
+    def import_legacy(self, url: str) -> str | None:
+        """把旧版平铺文件导入内容寻址路径（无校验信息，开启重新校验时会完整下载一次）。"""
+        legacy = os.path.join(self.root, image_file_name(url))
+        if not os.path.isfile(legacy):
+            return None
+        h = hashlib.sha256()
+        with open(legacy, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        return self.commit(url, legacy, h.hexdigest(), os.path.getsize(legacy))
+
+    def save(self):
+        """删除不再被引用的旧文件，并在清单有变化时原子写入。"""
+        with self._lock:
+            if not self.dirty:
+                return
+            referenced = {e["path"] for e in self.entries.values()}
+            for rel in self._orphans - referenced:
+                try:
+                    os.remove(self.abs_path(rel))
+                except OSError:
+                    pass
+            self._orphans.clear()
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write('{"version": 1, "images": {')
+                for n, url in enumerate(sorted(self.entries)):
+                    f.write(("\n" if n == 0 else ",\n") + json.dumps(url, ensure_ascii=False) + ": ")
+                    f.write(json.dumps(self.entries[url], ensure_ascii=False))
+                f.write("\n}}\n")
+            os.replace(tmp, self.path)
+            self.dirty = False
+
+
+_IMAGE_STORES: dict[str, ImageStore] = {}
+_IMAGE_STORES_LOCK = threading.Lock()
+
+
+def open_image_store(out_dir: str) -> ImageStore:
+    """同一输出目录共用一个 `ImageStore`（解析阶段的已捕获图片与末尾下载共享清单）。"""
+    key = os.path.abspath(out_dir)
+    with _IMAGE_STORES_LOCK:
+        store = _IMAGE_STORES.get(key)
+        if store is None:
+            store = _IMAGE_STORES[key] = ImageStore(out_dir)
+        return store
+
+
+def run_coro_sync(coro):
+    """在独立线程的新事件循环中运行协程并返回结果。
+    Playwright 同步 API 在当前线程占用了事件循环，直接 `asyncio.run` 会冲突。
+    """
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        return ex.submit(asyncio.run, coro).result()
+
+
+async def _download_image_async(
+    http: aiohttp.ClientSession,
+    sem: asyncio.Semaphore,
+    img_url: str,
+    store: ImageStore,
+    stats: dict,
+    revalidate: bool = False,
+    legacy: bool = True,
+) -> str | None:
+    local = store.local_path(img_url)
+    if local is None and legacy:
+        local = store.import_legacy(img_url)
+        if local is not None:
+            stats["imported"] += 1
+    if local is not None and not revalidate:
+        stats["skipped"] += 1
+        return local
+    headers = store.validators(img_url) if local is not None else {}
+    async with sem:
+        tmp = None
+        # 图片请求同样经全局限速器领取令牌，并发下载不突破整体请求速率
+        await RATE.acquire_async()
+        t0 = time.perf_counter()
+        try:
+            async with http.get(img_url, headers=headers) as r:
+                # 以响应头到达的耗时反馈给 `RATE`（成功也计入，限速器才能提速）
+                record_http_status(r.status, time.perf_counter() - t0)
+                if r.status == 304 and local is not None:
+                    stats["not_modified"] += 1
+                    return local
+                if r.status != 200:
+                    stats["failed"] += 1
+                    stats["errors"].append(f"{img_url} -> HTTP {r.status}")
+                    return local
+                # 流式写入临时文件并计算哈希，完成后按内容地址原子落位，避免中断留下半截图片
+                fd, tmp = store.temp_file()
+                h = hashlib.sha256()
+                size = 0
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in r.content.iter_chunked(64 * 1024):
+                        f.write(chunk)
+                        h.update(chunk)
+                        size += len(chunk)
+                stats["bytes"] += size
+                etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            before = (store.entries.get(img_url) or {}).get("hash")
+            path = store.commit(img_url, tmp, h.hexdigest(), size, etag, last_modified)
+            tmp = None
+            stats["unchanged" if before == h.hexdigest() else "downloaded"] += 1
+            return path
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            if isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                reason = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+                RATE.record(time.perf_counter() - t0, ok=False, reason=reason)
+            stats["failed"] += 1
+            stats["errors"].append(f"{img_url} -> {e!r}")
+            return local
+        finally:
+            METRICS.observe("image_download", time.perf_counter() - t0)
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+
+
+async def download_images_async(
+    img_urls: list[str],
+    store: ImageStore,
+    cookies: dict | None = None,
+    concurrency: int = 8,
+    per_host: int = 4,
+    revalidate: bool = False,
+) -> tuple[dict, dict]:
+    """并发下载图片（aiohttp）到内容寻址的 `store`。
+    - concurrency：同时进行的下载数上限；per_host：单主机连接池上限。
+    - 已有图片默认不发请求；`revalidate` 时带 ETag/Last-Modified 发条件请求，304 即保留。
+    - 旧版平铺文件只按 URL 末段对应；本次有多个 URL 末段相同时无法确定归属，这些 URL 不导入旧文件而是重新下载。
+    返回 `(url -> 本地路径, 统计)`；统计含 downloaded/unchanged/not_modified/skipped/imported/failed/bytes/elapsed/errors。
+    """
+    stats = {
+        "downloaded": 0,
+        "unchanged": 0,
+        "not_modified": 0,
+        "skipped": 0,
+        "imported": 0,
+        "failed": 0,
+        "bytes": 0,
+        "elapsed": 0.0,
+        "errors": [],
+    }
+    start = time.monotonic()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    connector = aiohttp.TCPConnector(
+        limit=max(1, concurrency), limit_per_host=max(1, per_host)
+    )
+    timeout = aiohttp.ClientTimeout(total=60, sock_read=30)
+    names = Counter(image_file_name(u) for u in img_urls)
+    async with aiohttp.ClientSession(
+        headers=HEADERS, cookies=cookies or {}, connector=connector, timeout=timeout
+    ) as http:
+        paths = await asyncio.gather(
+            *[
+                _download_image_async(
+                    http, sem, u, store, stats, revalidate, legacy=names[image_file_name(u)] == 1
+                )
+                for u in img_urls
+            ]
+        )
+    stats["elapsed"] = time.monotonic() - start
+    return {u: p for u, p in zip(img_urls, paths) if p}, stats
+
+
+def download_images(
+    urls: list[str],
+    session: requests.Session | None,
+    out_dir: str,
+    concurrency: int = 8,
+) -> dict:
+    """批量下载图片到内容寻址的 `out/images/`（见 `ImageStore`）；沿用 `session` 中已校验的 cookie。
+    结束时保存图片清单（含解析阶段已捕获的图片）。返回 `url -> 本地路径`。
+    """
+    store = open_image_store(out_dir)
+    if not urls:
+        store.save()
+        return {}
+    cookies = {c.name: c.value for c in session.cookies} if session else {}
+    local_map, stats = run_coro_sync(
+        download_images_async(
+            urls, store, cookies, concurrency=concurrency, revalidate=IMAGE_CONFIG["revalidate"]
+        )
+    )
+    store.save()
+    rate = stats["bytes"] / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+    print(
+        f"图片下载：新增/变化 {stats['downloaded']}，重下载内容未变 {stats['unchanged']}，"
+        f"304 未修改 {stats['not_modified']}，已存在未请求 {stats['skipped']}"
+        f"（其中由旧文件导入 {stats['imported']}），失败 {stats['failed']}，"
+        f"{stats['bytes']} 字节，用时 {stats['elapsed']:.1f}s，{rate / 1024:.1f} KiB/s"
+    )
+    for err in stats["errors"][:10]:
+        print(f"  图片下载失败: {err}")
+    return local_map
+
+
+def download_images_for_items(
+    items: list[dict],
+    session: requests.Session,
+    out_dir: str,
+    concurrency: int = 8,
+) -> dict:
+    """批量下载每个条目的首图并写入 `image_local`。"""
+    local_map = download_images(first_image_urls(items), session, out_dir, concurrency)
+    for it in items:
+        with_image_local(it, local_map)
+    return local_map
+
+
+def crawl_with_playwright(
+    limit: int = None,
+    delay: float = 0.5,
+    out_dir: str = "etmoc_output",
+    fetch_mode: str = "browser",
+    image_concurrency: int = 8,
+    min_rate: float = 0.0,
+    max_rate: float = 0.0,
+    sqlite: bool = False,
+    brand_workers: int | None = None,
+):
+    """品牌源：BrandAll → 各 BrandShow → 详情页。
+    - brand_workers：并发展开品牌页的线程数（见 `iter_brand_product_links`）；每个线程需要浏览器时各起一个 Chromium，
+      因此默认 `browser` 模式为 1（只多一个浏览器），`http` 模式为 4（主要走 HTTP，只有回退时才启动浏览器）。
+      详情页在当前线程解析，无需等待全部品牌展开，去重与 `limit` 随链接到达即时生效，达到 `limit` 后停止展开。
+    多节点分片（`SHARD_CONFIG`）时每个节点都展开全部品牌页，但只解析产品 Id 哈希落在本分片的详情页（见 `shard_owns_id`）。
+    """
+    if brand_workers is None:
+        brand_workers = 4 if fetch_mode == "http" else 1
+    RATE.configure(delay, min_rate, max_rate)
+    PAGELOAD.reset()
+    RECYCLES.reset()
+    READINESS.reset()
+    METRICS.reset("brands")
+    ensure_clean_out(out_dir)
+    METRICS.start_flusher(out_dir, METRICS_CONFIG["interval"])
+    jsonl_path = run_path(out_dir, "products_playwright.jsonl")
+    sink = JsonlSink(jsonl_path)
+    t_start = time.monotonic()
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        # 现场校验后页面即停在 BrandAll；复用已保存状态时直接打开 BrandAll
+        _, page, reused = open_verified_context(browser)
+        if reused:
+            browser_get(page, f"{BASE}/Firms/BrandAll", wait_for_brand_all_ready)
+            if is_challenge_html(page_html(page)):
+                print("已保存的会话状态失效，重新校验。")
+                verify_session(page)
+        brand_html = page_html(page)
+        with open(os.path.join(out_dir, "brand_all.html"), "w", encoding="utf-8") as f:
+            f.write(brand_html)
+        gate = RESOURCE_GATES.get(page.context)
+        if gate is not None and gate.enabled:
+            # 拦截层挡掉了样式表与字体：暂时放行并重新加载一次，截图才是带样式的页面（同 dump_html.py）
+            gate.enabled = False
+            try:
+                browser_get(page, f"{BASE}/Firms/BrandAll", wait_for_brand_all_ready)
+                page.screenshot(path=os.path.join(out_dir, "brand_all.png"), full_page=True)
+            finally:
+                gate.enabled = True
+        else:
+            page.screenshot(path=os.path.join(out_dir, "brand_all.png"), full_page=True)
+
+        brand_links = to_abs(page.url, find_links(brand_html, BRAND_LINK_PATTERN))
+        direct_links = to_abs(page.url, find_links(brand_html, PRODUCT_LINK_PATTERN))
+        if not brand_links and not direct_links:
+            print("品牌链接为空，页面可能仍受防护，稍后重试或增大等待时间。")
+            browser.close()
+            sink.close()
+            METRICS.stop_flusher()
+            return
+
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        cookies_to_requests(session, page.context.cookies())
+
+        def parse_detail(pu: str) -> dict:
+            soup = None
+            if fetch_mode == "http":
+                soup = fetch_soup_via_http(session, pu, "product")
+                count_fetch("http" if soup is not None else "browser_fallback")
+            if soup is None:
+                if not browser_get(page, pu, wait_for_product_ready):
+                    # 页面仍停在上一件产品，报告失败而不是把它当作本链接解析
+                    raise PlaywrightTimeoutError(f"详情页加载超时：{pu}")
+                soup = make_product_soup(page_html(page))
+                if fetch_mode == "http":
+                    cookies_to_requests(session, page.context.cookies())
+            return build_item_from_soup(soup, pu)
+
+        # 品牌页在后台线程并发展开，发现的详情链接按品牌顺序流入当前线程解析
+        expansion = iter_brand_product_links(
+            brand_links, page.context.storage_state(), brand_workers, fetch_mode
+        )
+
+        def discovered():
+            yield from direct_links
+            for b, found in expansion:
+                if found is None:
+                    print(f"品牌页加载超时，跳过：{b}")
+                    continue
+                yield from found
+
+        seen = set()
+        foreign = 0
+        attempted = 0
+
+        def wanted():
+            # 去重、分片过滤与 `limit` 随链接到达即时生效
+            nonlocal foreign, attempted
+            for pu in discovered():
+                if pu in seen:
+                    continue
+                seen.add(pu)
+                if not shard_owns_id(product_id_from_url(pu)):
+                    foreign += 1
+                    continue
+                if limit and attempted >= limit:
+                    break
+                attempted += 1
+                yield pu
+
+        def parse_inline():
+            for i, pu in enumerate(wanted()):
+                try:
+                    yield i, pu, parse_detail(pu), None
+                except Exception as e:
+                    yield i, pu, None, e
+
+        results = parse_inline()
+        pb = tqdm(total=limit or None, desc="详情解析", unit="项", dynamic_ncols=True)
+        try:
+            for _, pu, it, err in results:
+                if err is not None:
+                    print(f"详情解析失败: {pu} -> {err}")
+                    continue
+                sink.write(it)
+                if sink.count == 1:
+                    report_first_product(t_start, reused)
+                tqdm.write(f"[{sink.count}] {it.get('title', '')}")
+                pb.update(1)
+        finally:
+            results.close()
+            expansion.close()
+        print(f"品牌页 {len(brand_links)} 个，去重后详情链接 {len(seen)} 条，解析 {attempted} 条")
+        if is_sharded():
+            print(
+                f"分片 {SHARD_CONFIG['index']}/{SHARD_CONFIG['count']}：本分片详情链接 {len(seen) - foreign} 条，"
+                f"其他分片 {foreign} 条"
+            )
+
+        pb.close()
+        if fetch_mode == "http":
+            print(
+                f"HTTP 快速通道：命中 {FETCH_STATS['http']} 次，回退浏览器 {FETCH_STATS['browser_fallback']} 次"
+            )
+        sink.close()
+        # 统一下载图片，避免解析阶段的网络阻塞
+        image_map = download_images(
+            first_image_urls(iter_jsonl(jsonl_path)),
+            session,
+            out_dir,
+            concurrency=image_concurrency,
+        )
+        browser.close()
+
+    n = export_from_jsonl(jsonl_path, out_dir, "products_playwright", image_map, sqlite)
+    update_shard_manifest(out_dir, source="brands", items=n, finished=True)
+    RATE.report()
+    PAGELOAD.report(out_dir)
+    RECYCLES.report(out_dir)
+    READINESS.report(out_dir)
+    METRICS.report(out_dir)
+    print(f"完成：{n} 条，输出目录：{out_dir}")
+
+
+def iter_brand_product_links(
+    brand_links: list[str],
+    storage_state: dict | None,
+    workers: int = 1,
+    fetch_mode: str = "browser",
+):
+    """并发展开品牌页：`workers` 个线程各自领取 BrandShow 链接，`http` 模式优先经各自的 HTTP 会话拉取，
+    否则（或遇校验页/无产品链接时）用按需启动的浏览器渲染（注入 `storage_state`，免再校验）；共用全局限速器 `RATE`。
+    同步 API 绑定线程，每个线程的浏览器是独立的 Chromium：`browser` 模式下 N 个线程即 N 个额外浏览器。
+    返回生成器，按 `brand_links` 原顺序产出 `(品牌链接, 详情链接列表)`，加载失败时列表为 None；
+    每个品牌页展开完成即可产出，无需等待全部完成。提前关闭生成器（如达到 limit）时线程不再领取新的品牌页。
+    """
+    n = len(brand_links)
+    if not n:
+        return
+    work: queue.Queue = queue.Queue()
+    for k, b in enumerate(brand_links):
+        work.put((k, b))
+    results: queue.Queue = queue.Queue()
+    stop = threading.Event()
+
+    def expand(holder: dict, session, url: str) -> list[str] | None:
+        if session is not None:
+            html = http_get_html(session, url)
+            found = [] if is_challenge_html(html) else find_links(html, PRODUCT_LINK_PATTERN)
+            count_fetch("http" if found else "browser_fallback")
+            if found:
+                return to_abs(url, found)
+        if "page" not in holder:
+            pw = sync_playwright().start()
+            browser = pw.chromium.launch(headless=True)
+            _, pg, _ = open_verified_context(browser, storage_state)
+            holder.update(pw=pw, browser=browser, page=pg)
+        pg = holder["page"]
+        if not browser_get(pg, url, wait_for_brand_ready):
+            return None
+        if session is not None:
+            cookies_to_requests(session, pg.context.cookies())
+        return to_abs(pg.url, find_links(page_html(pg), PRODUCT_LINK_PATTERN))
+
+    def worker():
+        holder: dict = {}
+        session = None
+        if fetch_mode == "http":
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            cookies_to_requests(session, (storage_state or {}).get("cookies", []))
+        try:
+            while not stop.is_set():
+                try:
+                    k, url = work.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    res = expand(holder, session, url)
+                except Exception as e:
+                    print(f"品牌页展开异常 {url}: {e}")
+                    res = None
+                results.put((k, res))
+        finally:
+            if "browser" in holder:
+                try:
+                    holder["browser"].close()
+                finally:
+                    holder["pw"].stop()
+
+    threads = [
+        threading.Thread(target=worker, name=f"brand-expand-{k}", daemon=True)
+        for k in range(max(1, min(workers, n)))
+    ]
+    for t in threads:
+        t.start()
+    pending: dict[int, list[str] | None] = {}
+    try:
+        for expect in range(n):
+            while expect not in pending:
+                k, res = results.get()
+                pending[k] = res
+            yield brand_links[expect], pending.pop(expect)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def wait_for_catalog_ready(page, timeout: int | None = None) -> bool:
+    return READINESS.wait(page, "catalog", timeout)
+
+
+def wait_for_product_ready(page, timeout: int | None = None) -> bool:
+    return READINESS.wait(page, "product", timeout)
+
+
+def wait_for_brand_ready(page, timeout: int | None = None) -> bool:
+    return READINESS.wait(page, "brand", timeout)
+
+
+def wait_for_brand_all_ready(page, timeout: int | None = None) -> bool:
+    return READINESS.wait(page, "brand_all", timeout)
+
+
+def page_html(page) -> str:
+    """读取当前页面 HTML，耗时记入 `METRICS` 的 `content` 阶段。"""
+    with METRICS.timer("content"):
+        return page.content()
+
+
+def wait_for_network_idle(page) -> bool:
+    with METRICS.timer("wait_network_idle"):
+        try:
+            page.wait_for_load_state("networkidle")
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+
+def get_total_pages_number(page, root_url: str, timeout: int | None = None) -> int:
     """跳转目录首页并读取总页数。
     优先从 `SELECTORS["total_pages_anchor"]` 的文本或 href 提取页号；
     若站点结构改变或锚点不可用，则回退扫描导航中的分页链接并取最大页号。
     返回 >= 1 的整数；无法识别时返回 0（后续逻辑会视为“未知上限”）。
     """
-    try:
-        page.goto(root_url, wait_until="domcontentloaded")
-        wait_for_selector_safe(page, SELECTORS["total_pages_anchor"], timeout)
-    except PlaywrightTimeoutError:
-        page.wait_for_timeout(800)
+    browser_get(page, root_url, lambda pg: wait_for_catalog_ready(pg, timeout))
     # 尝试直接从锚点读取
     try:
         a = page.query_selector(SELECTORS["total_pages_anchor"])  # type: ignore
@@ -453,8 +3016,8 @@ def get_total_pages_number(page, root_url: str, timeout: int = 15000) -> int:
     except Exception:
         pass
     # 回退：扫描导航中的所有分页链接，取最大页号
-    html = page.content()
-    soup = BeautifulSoup(html, "html.parser")
+    html = page_html(page)
+    soup = make_soup(html)
     last_num = 0
     for a in soup.select("body > div.container nav ul li a[href]"):
         t = text_clean(a.get_text(" "))
@@ -474,27 +3037,237 @@ def get_total_pages_number(page, root_url: str, timeout: int = 15000) -> int:
     return last_num
 
 
+def load_checkpoint(path: str | None) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def load_known_product_ids(out_dir: str) -> set[str]:
+    """汇总以往运行已知的产品 Id：优先产品库，其次已导出的详情与链接文件。"""
+    store_path = os.path.join(out_dir, ProductStore.FILE_NAME)
+    if os.path.exists(store_path):
+        return set(ProductStore.load(out_dir).records)
+    known: set[str] = set()
+    for name, key in (("products_catalog.json", None), ("product_links.json", "links")):
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        urls = data.get(key, []) if key else [it.get("url", "") for it in data]
+        known.update(pid for pid in map(product_id_from_url, urls) if pid)
+    return known
+
+
+# 多节点分片：`--shard i/N` 让 N 台机器确定性地瓜分同一次抓取，各自写入 `<out>/shard-i-of-N/`，
+# 再由 `--action merge` 合并为规范输出
+SHARD_CONFIG = {"index": 1, "count": 1}
+SHARD_MANIFEST = "shard.json"
+SHARD_DIR_REGEX = re.compile(r"^shard-(\d+)-of-(\d+)$")
+
+
+def parse_shard_spec(spec: str) -> tuple[int, int]:
+    """解析 `i/N`（1 ≤ i ≤ N）；格式错误时抛出 ValueError。"""
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m:
+        raise ValueError(f"分片格式应为 i/N：{spec!r}")
+    index, count = int(m.group(1)), int(m.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"分片序号需满足 1 ≤ i ≤ N：{spec!r}")
+    return index, count
+
+
+def is_sharded() -> bool:
+    return SHARD_CONFIG["count"] > 1
+
+
+def shard_dir_name(index: int, count: int) -> str:
+    return f"shard-{index}-of-{count}"
+
+
+def shard_page_range(first: int, last: int, index: int, count: int) -> tuple[int, int]:
+    """把页号区间 `[first, last]` 切成 `count` 个连续页段，返回第 `index` 段（1 起）的首末页；
+    各段页数相差不超过 1，靠前的段多分；页数少于分片数时靠后的段为空（首页 > 末页）。
+    """
+    base, extra = divmod(max(0, last - first + 1), count)
+    start = first + (index - 1) * base + min(index - 1, extra)
+    size = base + (1 if index <= extra else 0)
+    return start, start + size - 1
+
+
+def shard_owns_id(pid: str | None) -> bool:
+    """品牌源按产品 Id 的 CRC32 取模分片（跨进程、跨机器稳定，不受 PYTHONHASHSEED 影响）；
+    无法识别 Id 的链接归第 1 个分片。
+    """
+    if not is_sharded():
+        return True
+    if not pid:
+        return SHARD_CONFIG["index"] == 1
+    return zlib.crc32(pid.encode("ascii")) % SHARD_CONFIG["count"] == SHARD_CONFIG["index"] - 1
+
+
+def update_shard_manifest(out_dir: str | None, **fields):
+    """分片运行时更新 `out/shard.json`（分片序号、来源、页段、完成页与条目数等），供合并时核对。"""
+    if not is_sharded() or not out_dir:
+        return
+    path = os.path.join(out_dir, SHARD_MANIFEST)
+    manifest = load_checkpoint(path)
+    manifest.update(index=SHARD_CONFIG["index"], count=SHARD_CONFIG["count"], **fields)
+    manifest["updated_at"] = int(time.time())
+    save_json(manifest, path)
+
+
+def collect_catalog_pages_sharded(
+    page_numbers: list[int],
+    root_url: str,
+    consume_page,
+    storage_state: dict | None,
+    workers: int = 2,
+    use_http: bool = False,
+    dynamic: bool = False,
+) -> int:
+    """数值分页的并发分片抓取：把页号区间切成连续页段放入队列，由 `workers` 个线程领取，
+    每个线程持有独立的 HTTP 会话（`use_http`）和按需启动的浏览器（注入主上下文的 `storage_state`，免再校验）；
+    所有线程共用全局限速器 `RATE`。
+    主线程按页序把结果交给 `consume_page`（去重、limit、早停与单线程一致），
+    一旦其返回结束或某页失败，即设置截止页，线程跳过截止页之后的页面。
+    `dynamic` 为 True（设置了 limit 或早停）时页段大小为 1，越过截止页的浪费不超过线程数。
+    返回最后一个被合并的页号；一页都未合并时返回 0。
+    """
+    n = len(page_numbers)
+    n_workers = max(1, min(workers, n))
+    chunk = 1 if dynamic else -(-n // n_workers)
+    work: queue.Queue = queue.Queue()
+    for k in range(0, n, chunk):
+        work.put(page_numbers[k : k + chunk])
+    results: queue.Queue = queue.Queue()
+    cutoff = [page_numbers[-1]]
+    skipped = object()
+
+    def fetch_links(page_holder: dict, session, page_url: str) -> list[str] | None:
+        if session is not None:
+            soup = fetch_soup_via_http(session, page_url, "catalog")
+            count_fetch("http" if soup is not None else "browser_fallback")
+            if soup is not None:
+                return to_abs(page_url, [a["href"] for a in select_catalog_anchors(soup)])
+        if "page" not in page_holder:
+            pw = sync_playwright().start()
+            browser = pw.chromium.launch(headless=True)
+            _, pg, _ = open_verified_context(browser, storage_state)
+            page_holder.update(pw=pw, browser=browser, page=pg)
+        pg = page_holder["page"]
+        if not browser_get(pg, page_url, wait_for_catalog_ready):
+            return None
+        if session is not None:
+            cookies_to_requests(session, pg.context.cookies())
+        soup = make_soup(page_html(pg), "catalog")
+        return to_abs(pg.url, [a["href"] for a in select_catalog_anchors(soup)])
+
+    def worker():
+        holder: dict = {}
+        session = None
+        if use_http:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            cookies_to_requests(session, (storage_state or {}).get("cookies", []))
+        try:
+            while True:
+                try:
+                    pages = work.get_nowait()
+                except queue.Empty:
+                    break
+                for num in pages:
+                    if num > cutoff[0]:
+                        results.put((num, skipped))
+                        continue
+                    try:
+                        res = fetch_links(holder, session, f"{root_url}?page={num}")
+                    except Exception as e:
+                        print(f"分片抓取异常 第 {num} 页: {e}")
+                        res = None
+                    results.put((num, res))
+        finally:
+            if "browser" in holder:
+                try:
+                    holder["browser"].close()
+                finally:
+                    holder["pw"].stop()
+
+    threads = [
+        threading.Thread(target=worker, name=f"catalog-shard-{k}", daemon=True)
+        for k in range(n_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    pending: dict[int, object] = {}
+    order = iter(page_numbers)
+    expect = next(order)
+    last_done = 0
+    stopped = False
+    for _ in range(n):
+        num, res = results.get()
+        pending[num] = res
+        while not stopped and expect in pending:
+            res = pending.pop(expect)
+            if res is None:
+                print(f"分页跳转失败或超时，结束于第 {expect} 页。")
+                stopped = True
+            elif res is not skipped:
+                last_done = expect
+                stopped = consume_page(expect, res)
+            if stopped:
+                cutoff[0] = expect
+                break
+            expect = next(order, None)
+            if expect is None:
+                break
+    for t in threads:
+        t.join()
+    return last_done
+
+
 def collect_catalog_links(
     page,
     pages_limit: int = 0,
-    delay: float = 0.7,
     limit: int = 0,
     start_page: int | str | None = None,
     incremental: bool = False,
     out_dir: str | None = None,
+    session: requests.Session | None = None,
+    fetch_mode: str = "browser",
+    known_ids: set[str] | None = None,
+    stop_after_known: int = 0,
+    workers: int = 1,
 ):
     """收集目录页中的产品详情链接（去重），支持总页数限制与增量模式。
     参数：
     - pages_limit：最多遍历的页数；0 表示不限（仍受站点总页数约束）。
-    - delay：每页间隔秒数。
     - limit：最多收集的链接条数；0 表示不限。
     - start_page：起始页，支持整数或 'latest'；'latest' 在有检查点时从上次完成页+1继续。
     - incremental：增量模式；默认从第 1 页开始，结合 'latest' 可继续深页。
     - out_dir：输出目录；用于保存检查点 `catalog_checkpoint.json`。
+    - session/fetch_mode：`fetch_mode="http"` 时数值分页页面优先经 `session` 拉取，校验页/空页回退浏览器。
+    - known_ids：以往运行已知的产品 Id；为空时以检查点中的 `high_water`（已见最大 Id）判断是否为新产品。
+    - stop_after_known：增量模式下连续 K 页没有新产品 Id 即提前结束；0 表示不启用。
+    - workers：数值分页且已知末页时的并发分片数；>1 时各分片独立抓取，按页序合并。
+    - 多节点分片（`SHARD_CONFIG`）：按总页数把 `[起始页, 末页]` 切成 N 个连续页段，只抓取本分片的页段；
+      `pages_limit` 与起始页限定的是全体分片的总范围，`limit` 与早停按分片各自计算；
+      页段写入 `out/shard.json`，`latest` 从本分片检查点继续。
     行为：
+    - 每次翻页前经全局限速器 `RATE` 领取令牌（速率由入口按 `--delay` 配置并自适应调整）。
     - 自动检测目录总页数，遍历范围为 `min(pages_limit(若>0), total_pages)`。
     - `numeric_mode` 为 True（设置了起始页或启用增量）时使用 `?page=N` 方式跳转，否则按“下一页”链接跟踪。
-    - 结束时在增量模式写入 `{"last_page": N}` 检查点。
+    - 结束时在增量模式写入 `{"last_page": N, "high_water": <已见最大 Id>}` 检查点。
     返回：
     - 去重后的产品详情链接列表（绝对 URL）。
     """
@@ -502,25 +3275,21 @@ def collect_catalog_links(
     checkpoint_path = (
         os.path.join(out_dir, "catalog_checkpoint.json") if out_dir else None
     )
-    numeric_mode = start_page is not None or incremental  # 数值分页模式：显式起始页或增量模式
+    # 数值分页模式：显式起始页、增量模式或多节点分片
+    numeric_mode = start_page is not None or incremental or is_sharded()
 
     def goto_and_ready(url: str) -> bool:
-        try:
-            page.goto(url, wait_until="domcontentloaded")
-        except PlaywrightTimeoutError:
+        if not browser_get(page, url, wait_for_catalog_ready):
             print(f"页面跳转超时，结束当前抓取：{url}")
-            page.wait_for_timeout(800)
-            return False
-        try:
-            wait_for_catalog_ready(page)
-        except PlaywrightTimeoutError:
-            print(f"目录选择器等待超时，跳过当前页：{url}")
-            page.wait_for_timeout(800)
             return False
         return True
 
     # 总页数检测（目录首页）
     total_pages = get_total_pages_number(page, root_url)
+    use_http = fetch_mode == "http" and session is not None
+    if use_http:
+        # 首页由浏览器完成校验，随后把 cookie 同步给 HTTP 会话
+        cookies_to_requests(session, page.context.cookies())
 
     # 计算起始页（增量默认从第一页开始；latest 显式从检查点继续）
     if numeric_mode:
@@ -529,9 +3298,7 @@ def collect_catalog_links(
             st = start_page.strip().lower()
             if st == "latest" and checkpoint_path and os.path.exists(checkpoint_path):
                 try:
-                    with open(checkpoint_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    last_page = int(data.get("last_page", 0))
+                    last_page = int(load_checkpoint(checkpoint_path).get("last_page", 0))
                     sp = last_page + 1 if last_page > 0 else 1
                 except Exception:
                     sp = 1
@@ -550,28 +3317,52 @@ def collect_catalog_links(
             return []
         page_index = 1
 
+    end_page = total_pages
+    if is_sharded():
+        if not total_pages:
+            print("未识别到目录总页数，无法按页段分片。")
+            return []
+        resume = isinstance(start_page, str) and start_page.strip().lower() == "latest"
+        first = 1 if resume else page_index
+        last = min(total_pages, first + pages_limit - 1) if pages_limit else total_pages
+        shard_first, end_page = shard_page_range(
+            first, last, SHARD_CONFIG["index"], SHARD_CONFIG["count"]
+        )
+        print(
+            f"分片 {SHARD_CONFIG['index']}/{SHARD_CONFIG['count']}：目录页 {shard_first}-{end_page}"
+            f"（全体 {first}-{last}）"
+        )
+        update_shard_manifest(out_dir, source="catalog", pages=[shard_first, end_page])
+        if shard_first > end_page:
+            print("本分片没有分到目录页。")
+            return []
+        page_index = max(page_index, shard_first)
+        # 页段已包含 pages_limit 约束
+        pages_limit = 0
+
     seen = set()
     links: list[str] = []
     pages_processed = 0
+    # 早停前沿：已知集合（或检查点高水位）判断新产品，统计连续无新产品的页数
+    checkpoint = load_checkpoint(checkpoint_path) if incremental else {}
+    prev_high_water = int(checkpoint.get("high_water", 0) or 0)
+    high_water = prev_high_water
+    known_ids = set(known_ids or ())
+    frontier_active = bool(incremental and numeric_mode and stop_after_known > 0)
+    pages_without_new = 0
 
-    while True:
-        # 若已超过总页数，终止
-        if total_pages and page_index > total_pages:
-            break
-        if numeric_mode:
-            page_url = f"{root_url}?page={page_index}"
-            if not goto_and_ready(page_url):
-                print(f"分页跳转失败或超时，结束于第 {page_index} 页。")
-                break
-        html = page.content()
-        soup = BeautifulSoup(html, "html.parser")
-        anchors = soup.select(SELECTORS["product_links_in_catalog"])
-        hrefs = [a["href"] for a in anchors if a.has_attr("href")]
-        abs_links = to_abs(page.url, hrefs)
+    def is_new_id(pid: str) -> bool:
+        if known_ids:
+            return pid not in known_ids
+        return int(pid) > prev_high_water
+
+    def consume_page(index: int, abs_links: list[str]) -> bool:
+        """合并一页链接（去重、limit、早停统计）；返回是否应结束翻页。"""
+        nonlocal high_water, pages_without_new
         if total_pages:
-            print(f"目录页 {page_index}/{total_pages}，产品链接 {len(abs_links)} 条")
+            print(f"目录页 {index}/{total_pages}，产品链接 {len(abs_links)} 条")
         else:
-            print(f"目录页 {page_index}，产品链接 {len(abs_links)} 条")
+            print(f"目录页 {index}，产品链接 {len(abs_links)} 条")
         for u in abs_links:
             if u in seen:
                 continue
@@ -579,9 +3370,71 @@ def collect_catalog_links(
                 break
             seen.add(u)
             links.append(u)
+        page_ids = [pid for pid in map(product_id_from_url, abs_links) if pid]
+        if page_ids:
+            high_water = max(high_water, max(int(pid) for pid in page_ids))
+        if frontier_active:
+            if any(is_new_id(pid) for pid in page_ids):
+                pages_without_new = 0
+            else:
+                pages_without_new += 1
+        if limit and len(links) >= limit:
+            return True
+        if frontier_active and pages_without_new >= stop_after_known:
+            print(f"连续 {pages_without_new} 页无新产品，增量抓取提前结束于第 {index} 页。")
+            return True
+        return False
+
+    # 数值分页且已知末页时按页段分片并发抓取（见 `collect_catalog_pages_sharded`）
+    last_index = end_page or 0
+    if pages_limit:
+        cap = page_index + pages_limit - 1
+        last_index = min(last_index, cap) if last_index else cap
+    if numeric_mode and workers > 1 and last_index >= page_index + 1:
+        done_index = collect_catalog_pages_sharded(
+            list(range(page_index, last_index + 1)),
+            root_url,
+            consume_page,
+            page.context.storage_state(),
+            workers=workers,
+            use_http=use_http,
+            dynamic=bool(limit or frontier_active),
+        )
+        page_index = (done_index or page_index - 1) + 1
+        sequential = False
+    else:
+        sequential = True
+
+    while sequential:
+        # 若已超过总页数（或本分片末页），终止
+        if end_page and page_index > end_page:
+            break
+        soup = None
+        page_url = page.url
+        if numeric_mode:
+            page_url = f"{root_url}?page={page_index}"
+            if use_http:
+                soup = fetch_soup_via_http(session, page_url, "catalog")
+                count_fetch("http" if soup is not None else "browser_fallback")
+            if soup is None:
+                if not goto_and_ready(page_url):
+                    print(f"分页跳转失败或超时，结束于第 {page_index} 页。")
+                    break
+                page_url = page.url
+                if use_http:
+                    cookies_to_requests(session, page.context.cookies())
+        if soup is None:
+            html = page_html(page)
+            # 数值分页只需左列链接，可局部解析；跟踪“下一页”时需要整页
+            soup = make_soup(html, "catalog" if numeric_mode else None)
+        anchors = select_catalog_anchors(soup)
+        hrefs = [a["href"] for a in anchors if a.has_attr("href")]
+        stop = consume_page(page_index, to_abs(page_url, hrefs))
 
         # 当前页处理完成后的退出条件
-        if limit and len(links) >= limit:
+        if stop:
+            if numeric_mode:
+                page_index += 1
             break
         if pages_limit:
             if numeric_mode and (pages_processed + 1) >= pages_limit:
@@ -603,33 +3456,778 @@ def collect_catalog_links(
                 print(f"下一页加载失败或超时，结束于第 {page_index} 页。")
                 break
             page_index += 1
-        time.sleep(delay)
 
     # 增量检查点：记录最后完成页号（数值分页时为当前索引-1）
     if incremental and checkpoint_path:
         try:
             last_page_done = page_index - (1 if numeric_mode else 0)
-            save_json({"last_page": max(last_page_done, 1)}, checkpoint_path)
+            checkpoint.update(
+                {"last_page": max(last_page_done, 1), "high_water": high_water}
+            )
+            save_json(checkpoint, checkpoint_path)
         except Exception:
             pass
+    if numeric_mode:
+        update_shard_manifest(out_dir, last_page=page_index - 1, links=len(links))
 
     return links
 
 
+def fetch_product_html(
+    page, session: requests.Session | None, url: str, fetch_mode: str = "browser"
+) -> str:
+    """获取详情页 HTML：`http` 模式先走快速通道（非校验页且含标题块），否则由浏览器渲染。
+    浏览器跳转超时抛出 `PlaywrightTimeoutError`：复用的页面此时仍是上一件产品，不能当作本链接的结果。
+    """
+    if fetch_mode == "http" and session is not None:
+        html = http_get_html(session, url)
+        if is_product_html(html):
+            count_fetch("http")
+            return html
+        count_fetch("browser_fallback")
+    gate = RESOURCE_GATES.get(page.context)
+    if gate is not None:
+        gate.capturing = True
+    try:
+        loaded = browser_get(page, url, wait_for_product_ready)
+    finally:
+        if gate is not None:
+            gate.capturing = False
+    if not loaded:
+        # 交给调用方记为失败（日志 record_failed），--resume 时重试
+        raise PlaywrightTimeoutError(f"详情页加载超时：{url}")
+    html = page_html(page)
+    if fetch_mode == "http" and session is not None:
+        # 浏览器可能刚完成重新校验，同步 cookie 让后续请求继续走快速通道
+        cookies_to_requests(session, page.context.cookies())
+    return html
+
+
+def fetch_product_job(
+    page,
+    session: requests.Session | None,
+    url: str,
+    fetch_mode: str = "browser",
+    store: ProductStore | None = None,
+    archive: HtmlArchive | None = None,
+) -> dict:
+    """抓取阶段：取得详情页 HTML、写入归档并计算页面指纹；指纹与库一致时直接带出已存条目（无需解析）。
+    拦截层已捕获的图片字节一并取出，交给 `finish_product_job` 落盘。
+    返回任务 `{"url", "html", "fingerprint", "item", "images"}`。
+    """
+    # 请求节奏由 fetch_product_html 内的全局限速器控制
+    html = fetch_product_html(page, session, url, fetch_mode)
+    if archive is not None and not is_challenge_html(html):
+        archive.put(url, html)
+    job = {"url": url, "html": html, "fingerprint": None, "item": None, "images": {}}
+    if store is not None:
+        job["fingerprint"] = html_fingerprint(html)
+        job["item"] = store.lookup_unchanged(url, job["fingerprint"])
+    gate = RESOURCE_GATES.get(page.context) if page is not None else None
+    if gate is not None:
+        job["images"] = gate.take_images()
+    return job
+
+
+def finish_product_job(
+    job: dict, item: dict, out_dir: str, store: ProductStore | None = None
+) -> dict:
+    """收尾阶段：保存已捕获的首图字节（末尾下载阶段会跳过已存在的文件），并 upsert 到产品库。"""
+    imgs = item.get("images") or []
+    body = job["images"].get(imgs[0]) if imgs else None
+    if body:
+        save_image_bytes(out_dir, imgs[0], body)
+    if store is not None:
+        store.upsert(job["url"], item, job["fingerprint"])
+    # 其余图片统一在任务末尾下载
+    return item
+
+
 def parse_product_item(
-    page, session: requests.Session, url: str, out_dir: str, delay: float = 0.7
+    page,
+    session: requests.Session,
+    url: str,
+    out_dir: str,
+    fetch_mode: str = "browser",
+    store: ProductStore | None = None,
+    archive: HtmlArchive | None = None,
 ):
+    """同一线程内依次抓取、解析、收尾；流水线模式见 `ParsePipeline`。"""
+    job = fetch_product_job(page, session, url, fetch_mode, store, archive)
+    item = job["item"] or build_item_from_soup(make_product_soup(job["html"]), url)
+    return finish_product_job(job, item, out_dir, store)
+
+
+def _parse_product_html(url: str, html: str) -> tuple[dict, list[tuple[str, float]]]:
+    # 解析子进程入口：返回条目与本次解析的阶段耗时（由主进程记入 METRICS）
+    METRICS.take_samples()
+    item = build_item_from_soup(make_product_soup(html), url)
+    return item, METRICS.take_samples()
+
+
+class ParsePipeline:
+    """抓取/解析分离：抓取线程把原始 HTML 交给解析进程池，立即去抓下一页，CPU 解析不再阻塞导航。
+    - 有界队列：最多 `max_pending` 个页面在等待或正在解析，超出时 `submit` 阻塞抓取线程（背压）。
+    - `submit` 返回的任务交给 `resolve` 按原顺序取结果；解析异常按 URL 报告，不影响其他页面。
+    - 多个抓取线程可共享同一实例。
+    """
+
+    def __init__(self, parsers: int = 1, max_pending: int = 16):
+        self.parsers = max(1, parsers)
+        self.max_pending = max(1, max_pending)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = parser_process_pool(self.parsers)
+
+    def submit(self, job: dict) -> dict:
+        """把抓取任务交给解析进程；指纹命中库（已有条目）时不占用解析进程。"""
+        if job["item"] is None:
+            self._slots.acquire()
+            try:
+                future = self._executor.submit(_parse_product_html, job["url"], job["html"])
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            job["future"] = future
+        # HTML 已交给解析进程，释放本进程中的副本
+        job["html"] = None
+        return job
+
+    def resolve(self, job: dict, out_dir: str, store: ProductStore | None = None) -> dict:
+        """等待解析完成并收尾；解析异常原样抛出。"""
+        future = job.pop("future", None)
+        if future is not None:
+            item, timings = future.result()
+            for stage, seconds in timings:
+                METRICS.observe(stage, seconds)
+            job["item"] = item
+        return finish_product_job(job, job["item"], out_dir, store)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def settle_product_result(
+    entry: tuple, pipeline: ParsePipeline | None, out_dir: str, store: ProductStore | None
+) -> tuple:
+    """把 `(index, link, 条目或流水线任务, error)` 结算为 `(index, link, item, error)`：
+    流水线任务在此等待解析结果并收尾，解析异常转为该 URL 的 error。
+    """
+    i, link, payload, err = entry
+    if err is not None or pipeline is None:
+        return entry
     try:
-        page.goto(url, wait_until="domcontentloaded")
-        wait_for_product_ready(page)
-    except PlaywrightTimeoutError:
-        page.wait_for_timeout(800)
-    prod_html = page.content()
-    soup = BeautifulSoup(prod_html, "html.parser")
-    item = build_item_from_soup(soup, url)
-    # 统一下载图片移动到任务末尾
-    time.sleep(delay)
-    return item
+        return i, link, pipeline.resolve(payload, out_dir, store), None
+    except Exception as e:
+        return i, link, None, e
+
+
+def iter_products_inline(
+    page,
+    session: requests.Session | None,
+    links: list[str],
+    out_dir: str,
+    fetch_mode: str = "browser",
+    store: ProductStore | None = None,
+    archive: HtmlArchive | None = None,
+):
+    """单浏览器逐页抓取并在当前线程解析，产出格式同 `iter_products_pipelined`。"""
+    for i, link in enumerate(links):
+        try:
+            item = parse_product_item(
+                page, session, link, out_dir, fetch_mode=fetch_mode, store=store, archive=archive
+            )
+            yield i, link, item, None
+        except Exception as e:
+            yield i, link, None, e
+
+
+def iter_products_pipelined(
+    page,
+    session: requests.Session | None,
+    links: list[str],
+    out_dir: str,
+    pipeline: ParsePipeline,
+    fetch_mode: str = "browser",
+    store: ProductStore | None = None,
+    archive: HtmlArchive | None = None,
+):
+    """单浏览器的流水线：当前线程逐页抓取并提交解析，解析在进程池中并行进行。
+    返回生成器，按 `links` 原顺序产出 `(index, link, item, error)`（与 `iter_products_with_pool` 一致）；
+    抓取或解析失败时 item 为 None。
+    """
+    pending: deque = deque()
+
+    for i, link in enumerate(links):
+        try:
+            job = fetch_product_job(page, session, link, fetch_mode, store, archive)
+            pending.append((i, link, pipeline.submit(job), None))
+        except Exception as e:
+            pending.append((i, link, None, e))
+        # 队首已解析完的结果先行产出，不等待整批结束
+        while pending and (
+            pending[0][3] is not None
+            or "future" not in pending[0][2]
+            or pending[0][2]["future"].done()
+        ):
+            yield settle_product_result(pending.popleft(), pipeline, out_dir, store)
+    while pending:
+        yield settle_product_result(pending.popleft(), pipeline, out_dir, store)
+
+
+def iter_products_with_pool(
+    links: list[str],
+    storage_state: dict | None,
+    out_dir: str,
+    workers: int = 2,
+    fetch_mode: str = "browser",
+    store: ProductStore | None = None,
+    archive: HtmlArchive | None = None,
+    pipeline: ParsePipeline | None = None,
+):
+    """线程 worker 并发解析详情：N 个 worker 线程各自持有独立的 Playwright 浏览器/上下文，
+    从共享队列领取链接；所有 worker 共用全局限速器 `RATE`，并发不突破整体请求速率。
+    Playwright 同步 API 绑定创建它的线程，页面不能跨线程共用，因此每个 worker 各起一个驱动与一个完整的 Chromium：
+    调用方在启动本函数前关闭主浏览器（见 `crawl_catalog_with_playwright`），`--workers 4` 即 4 个 Chromium，内存约按 worker 数线性增长。
+    参数：
+    - links：已去重的详情链接（顺序即输出顺序）。
+    - storage_state：主浏览器上下文的会话状态，注入每个 worker 上下文以沿用校验结果。
+    - fetch_mode：`http` 时每个 worker 另持一个 requests 会话走快速通道，失败再回退浏览器。
+    - store：产品库；各 worker 共享（内部加锁），用于指纹复用与 upsert。
+    - archive：原始 HTML 归档；各 worker 共享（内部加锁）。
+    - pipeline：给出时 worker 只负责抓取，HTML 交给共享的解析进程池（见 `ParsePipeline`），产出时按序取回结果。
+    返回：
+    - 生成器，按 `links` 原顺序产出 `(index, link, item, error)`；失败时 item 为 None。
+    """
+    work: queue.Queue = queue.Queue()
+    for i, link in enumerate(links):
+        work.put((i, link))
+    results: queue.Queue = queue.Queue()
+    n_workers = max(1, min(int(workers or 1), len(links)))
+
+    def worker():
+        try:
+            with sync_playwright() as p:
+                browser = p.chromium.launch(headless=True)
+                _, page, _ = open_verified_context(browser, storage_state)
+                session = None
+                if fetch_mode == "http":
+                    session = requests.Session()
+                    session.headers.update(HEADERS)
+                    cookies_to_requests(session, page.context.cookies())
+                while True:
+                    try:
+                        i, link = work.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        if pipeline is not None:
+                            job = fetch_product_job(
+                                page, session, link, fetch_mode, store, archive
+                            )
+                            results.put((i, link, pipeline.submit(job), None))
+                            continue
+                        item = parse_product_item(
+                            page,
+                            session,
+                            link,
+                            out_dir,
+                            fetch_mode=fetch_mode,
+                            store=store,
+                            archive=archive,
+                        )
+                        results.put((i, link, item, None))
+                    except Exception as e:
+                        results.put((i, link, None, e))
+                browser.close()
+        except Exception as e:
+            # 浏览器启动失败：剩余链接由其他 worker 继续领取；若全部失败则逐条报告
+            print(f"详情 worker 异常: {e}")
+        finally:
+            results.put(None)
+
+    threads = [
+        threading.Thread(target=worker, name=f"detail-worker-{k}", daemon=True)
+        for k in range(n_workers)
+    ]
+    for t in threads:
+        t.start()
+
+    # 重排缓冲：按原始下标顺序产出，保证输出顺序确定
+    pending: dict[int, tuple] = {}
+    next_index = 0
+    alive = n_workers
+    while alive:
+        res = results.get()
+        if res is None:
+            alive -= 1
+            continue
+        pending[res[0]] = res
+        while next_index in pending:
+            yield settle_product_result(pending.pop(next_index), pipeline, out_dir, store)
+            next_index += 1
+    for t in threads:
+        t.join()
+    # 所有 worker 都退出但仍有未领取的链接（如浏览器均启动失败），逐条报告失败
+    while True:
+        try:
+            i, link = work.get_nowait()
+        except queue.Empty:
+            break
+        pending[i] = (i, link, None, RuntimeError("无可用的详情 worker"))
+    for i in sorted(pending):
+        yield settle_product_result(pending[i], pipeline, out_dir, store)
+
+
+def export_store(store: ProductStore, out_dir: str, sqlite: bool = False):
+    """打印产品库统计，并在库有改动或导出文件缺失时保存库、导出 JSON/CSV（及 SQLite）。"""
+    st = store.stats
+    print(
+        f"产品库：新增 {st['added']}，更新 {st['updated']}，未变 {st['unchanged']}"
+        f"（其中指纹复用 {st['reused']}），库内共 {len(store)} 条"
+    )
+    json_path = os.path.join(out_dir, "products_catalog.json")
+    csv_path = os.path.join(out_dir, "products_catalog.csv")
+    db_path = os.path.join(out_dir, "products_catalog.db")
+    col_path = columnar_path(out_dir, "products_catalog")
+    exports = [json_path, csv_path] + ([db_path] if sqlite else [])
+    if col_path and HAS_PYARROW:
+        exports.append(col_path)
+    if store.dirty or not all(os.path.exists(x) for x in exports):
+        store.save()
+        items = store.item_view()
+        with METRICS.timer("write_json"):
+            export_json_from_jsonl(items, json_path)
+        with METRICS.timer("write_csv"):
+            export_csv_from_jsonl(items, csv_path)
+        if sqlite:
+            save_sqlite(items, db_path)
+        if col_path:
+            save_columnar(items, col_path, EXPORT_CONFIG["columnar"])
+    else:
+        print("产品库无变化，跳过导出。")
+
+
+def reparse_archive(out_dir: str = "etmoc_output", workers: int = 0, sqlite: bool = False):
+    """离线重建：从 `out/.run/html_archive.db` 读取详情页原始 HTML，多进程重新解析后 upsert 到产品库并导出，
+    不访问网络、不启动浏览器。用于 `KEYS_WHITELIST`、`extract_info` 等抽取规则变化之后。
+    - workers：解析进程数，0 表示使用全部 CPU 核。
+    - 条目顺序沿用产品库；库中没有的新条目按归档的首次抓取顺序插入；已下载图片的 `image_local` 保留。
+    """
+    path = os.path.join(out_dir, RUN_DIR, HtmlArchive.FILE_NAME)
+    if not os.path.exists(path):
+        print(f"归档不存在：{path}（先以 --archive 运行详情抓取）")
+        return
+    METRICS.reset("reparse")
+    rows = HtmlArchive.read(path, "product")
+    if not rows:
+        print("归档中没有详情页。")
+        return
+    store = ProductStore.load(out_dir, seed_json=os.path.join(out_dir, "products_catalog.json"))
+    n_workers = max(1, workers or os.cpu_count() or 1)
+    chunks = [rows[k : k + REPARSE_CHUNK] for k in range(0, len(rows), REPARSE_CHUNK)]
+    t0 = time.perf_counter()
+    pb = tqdm(total=len(rows), desc="离线重解析", unit="页", dynamic_ncols=True)
+    with parser_process_pool(n_workers) as ex:
+        for results in ex.map(_reparse_rows, chunks):
+            for url, item, fingerprint in results:
+                store.upsert(url, item, fingerprint)
+            pb.update(len(results))
+    pb.close()
+    elapsed = time.perf_counter() - t0
+    print(
+        f"离线重解析：{len(rows)} 页，{n_workers} 个进程，耗时 {elapsed:.1f}s"
+        f"（{len(rows) / elapsed if elapsed else 0:.0f} 页/秒）"
+    )
+    store.merge_order([product_id_from_url(url) for url, _ in rows])
+    export_store(store, out_dir, sqlite)
+    METRICS.report(out_dir)
+
+
+def find_shard_dirs(out_dir: str) -> list[tuple[int, int, str]]:
+    """列出 `out_dir` 下的分片输出目录，返回按分片序号排序的 `(index, count, 路径)`。"""
+    found = []
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            m = SHARD_DIR_REGEX.match(name)
+            path = os.path.join(out_dir, name)
+            if m and os.path.isdir(path):
+                found.append((int(m.group(1)), int(m.group(2)), path))
+    return sorted(found)
+
+
+def item_diff_fields(a: dict, b: dict) -> list[str]:
+    """两条目取值不同的字段名（`info` 内的字段记为 `info.<键>`），忽略本地图片路径。"""
+    fields = []
+    for k in sorted((set(a) | set(b)) - {"info", "image_local"}):
+        if a.get(k) != b.get(k):
+            fields.append(k)
+    ia, ib = a.get("info") or {}, b.get("info") or {}
+    for k in sorted(set(ia) | set(ib)):
+        if ia.get(k) != ib.get(k):
+            fields.append(f"info.{k}")
+    return fields
+
+
+def merge_shard_image(
+    item: dict, shard_dir: str, shard_images: ImageStore, images: ImageStore, image_conflicts: list
+):
+    """把条目的本地首图复制到合并目录的同一内容地址、并入图片清单，并改写 `image_local`；
+    分片目录可能是从其他机器拷来的，原路径不存在时在分片的 `images/` 下按相同相对路径查找。
+    旧版按文件名平铺的图片同名但大小不同时记为冲突。
+    """
+    local = item.get("image_local")
+    if not local:
+        return
+    name = os.path.basename(local)
+    m = IMAGE_HASH_NAME.match(name)
+    rel = ImageStore.rel_path(m.group(1), m.group(2)) if m else name
+    src = local if os.path.exists(local) else shard_images.abs_path(rel)
+    if not os.path.exists(src):
+        item.pop("image_local", None)
+        return
+    dst = images.abs_path(rel)
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.copy2(src, dst)
+    elif not m and os.path.getsize(dst) != os.path.getsize(src):
+        image_conflicts.append({"file": name, "shard": os.path.basename(shard_dir)})
+    imgs = item.get("images") or []
+    entry = shard_images.entries.get(imgs[0]) if imgs else None
+    if entry:
+        images.record(imgs[0], dict(entry))
+    item["image_local"] = dst
+
+
+def merge_shards(out_dir: str = "etmoc_output", source: str = "catalog", sqlite: bool = False) -> dict:
+    """合并 `out/shard-i-of-N/` 的分片输出为规范输出（不访问网络）：
+    - 按分片序号依次读取各分片导出的 JSON（目录源的页段按序号递增，拼接后即为目录顺序）。
+    - 按产品 Id 去重：内容一致计为重复；内容不同计为冲突，保留序号较小分片的条目，并列出不同的字段。
+    - 分片图片按内容地址复制到 `out/images/` 并合并图片清单；目录源重建 `out/product_store.json`（沿用分片库的页面指纹），便于之后增量运行。
+    - 报告写入 `out/merge_report.json`（分片核对、条目数、重复与冲突）。
+    返回报告字典。
+    """
+    stem = "products_catalog" if source == "catalog" else "products_playwright"
+    shards = find_shard_dirs(out_dir)
+    report = {
+        "source": source,
+        "shards": [],
+        "missing_shards": [],
+        "items": 0,
+        "duplicates": 0,
+        "conflicts": [],
+        "image_conflicts": [],
+    }
+    if not shards:
+        print(f"未找到分片目录：{out_dir}/shard-i-of-N")
+        return report
+    counts = sorted({count for _, count, _ in shards})
+    if len(counts) > 1:
+        print(f"警告：分片总数不一致 {counts}，请确认分片目录来自同一次抓取。")
+    expected = max(counts)
+    present = {index for index, count, _ in shards if count == expected}
+    report["missing_shards"] = [i for i in range(1, expected + 1) if i not in present]
+
+    images = open_image_store(out_dir)
+    merged: dict[str, tuple[dict, str | None, str]] = {}
+    for index, count, shard_dir in shards:
+        name = os.path.basename(shard_dir)
+        manifest = load_checkpoint(os.path.join(shard_dir, SHARD_MANIFEST))
+        path = os.path.join(shard_dir, f"{stem}.json")
+        entry = {"shard": name, "manifest": manifest, "items": 0}
+        report["shards"].append(entry)
+        if manifest.get("source") not in (None, source):
+            print(f"跳过来源不符的分片 {name}（{manifest.get('source')}）")
+            continue
+        if not manifest.get("finished"):
+            print(f"警告：分片 {name} 未记录完成，输出可能不完整。")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"分片输出读取失败 {path}: {e}")
+            continue
+        fingerprints = {}
+        if source == "catalog" and os.path.exists(os.path.join(shard_dir, ProductStore.FILE_NAME)):
+            fingerprints = {
+                pid: rec.get("fingerprint")
+                for pid, rec in ProductStore.load(shard_dir).records.items()
+            }
+        entry["items"] = len(items)
+        shard_images = ImageStore(shard_dir)
+        for it in items:
+            pid = product_id_from_url(it.get("url", ""))
+            if not pid:
+                continue
+            if pid in merged:
+                kept, _, kept_from = merged[pid]
+                fields = item_diff_fields(kept, it)
+                if fields:
+                    report["conflicts"].append(
+                        {"id": pid, "kept": kept_from, "dropped": name, "fields": fields}
+                    )
+                else:
+                    report["duplicates"] += 1
+                continue
+            merge_shard_image(it, shard_dir, shard_images, images, report["image_conflicts"])
+            merged[pid] = (it, fingerprints.get(pid), name)
+
+    images.save()
+    items = [it for it, _, _ in merged.values()]
+    report["items"] = len(items)
+    if source == "catalog":
+        store = ProductStore(os.path.join(out_dir, ProductStore.FILE_NAME))
+        for it, fingerprint, _ in merged.values():
+            store.upsert(it["url"], it, fingerprint)
+        export_store(store, out_dir, sqlite)
+    else:
+        save_json(items, os.path.join(out_dir, f"{stem}.json"))
+        save_csv(items, os.path.join(out_dir, f"{stem}.csv"))
+        if sqlite:
+            save_sqlite(items, os.path.join(out_dir, f"{stem}.db"))
+        if columnar_path(out_dir, stem):
+            save_columnar(items, columnar_path(out_dir, stem), EXPORT_CONFIG["columnar"])
+    save_json(report, os.path.join(out_dir, "merge_report.json"))
+
+    print(
+        f"分片合并：{len(shards)} 个分片，合并 {len(items)} 条，重复 {report['duplicates']} 条，"
+        f"冲突 {len(report['conflicts'])} 条，图片同名冲突 {len(report['image_conflicts'])} 个"
+    )
+    if report["missing_shards"]:
+        print(f"缺少分片：{', '.join(f'{i}/{expected}' for i in report['missing_shards'])}")
+    for c in report["conflicts"][:10]:
+        print(f"  冲突 Id={c['id']}：保留 {c['kept']}，舍弃 {c['dropped']}，字段 {', '.join(c['fields'])}")
+    return report
+
+
+# 运行间变更流：按产品 Id 比较两次运行的条目哈希，只读取变化的记录，输出紧凑的 JSONL 变更流
+CHANGES_FILE = "changes.jsonl"
+STORE_HASH_REGEX = re.compile(rb'"hash": "([0-9a-f]+)"')
+STORE_DIGEST_REGEX = re.compile(rb'\{"version": \d+, "digest": "([0-9a-f]+)"')
+
+
+class RunSnapshot:
+    """一次运行输出的按 Id 索引视图（只读）：
+    - 目录源优先读 `.run/product_index.json`（与库文件大小及首行 digest 一致时），只含哈希与偏移，按需从 `product_store.json` 读取单行记录；
+    - 索引缺失（索引在 git 忽略的 `.run/` 下，从仓库检出的其他版本都没有）或过期时逐行扫描库文件取哈希与偏移（不解析条目），
+      这一步随库文件大小线性增长；
+    - 没有产品库时（brands 源或旧输出）退回加载导出的 JSON 并现算哈希。
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.kind = None
+        self.hashes: dict[str, str] = {}
+        self._offsets: dict[str, tuple[int, int]] = {}
+        self._items: dict[str, dict] = {}
+        self._store_path = os.path.join(out_dir, ProductStore.FILE_NAME)
+
+    @classmethod
+    def open(cls, out_dir: str, source: str = "catalog") -> "RunSnapshot | None":
+        snap = cls(out_dir)
+        if source == "catalog" and os.path.exists(snap._store_path):
+            if not snap._load_index():
+                snap._scan_store()
+            return snap
+        stem = "products_catalog" if source == "catalog" else "products_playwright"
+        path = os.path.join(out_dir, f"{stem}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"无法读取运行输出 {out_dir}: {e}")
+            return None
+        for it in items:
+            pid = product_id_from_url(it.get("url", ""))
+            if pid and pid not in snap._items:
+                snap._items[pid] = it
+                snap.hashes[pid] = item_hash(it)
+        snap.kind = "json"
+        return snap
+
+    def _load_index(self) -> bool:
+        index = load_checkpoint(os.path.join(self.out_dir, RUN_DIR, ProductStore.INDEX_NAME))
+        # 只读库文件首行：大小与首行 digest 都与索引一致才使用（git 检出的同样大小的新库文件首行 digest 不同）
+        if index.get("store_size") != os.path.getsize(self._store_path):
+            return False
+        with open(self._store_path, "rb") as f:
+            m = STORE_DIGEST_REGEX.match(f.readline())
+        if not m or index.get("store_digest") != m.group(1).decode():
+            return False
+        for pid, (h, offset, length) in index.get("products", {}).items():
+            self.hashes[pid] = h
+            self._offsets[pid] = (offset, length)
+        self.kind = "index"
+        return True
+
+    def _scan_store(self):
+        offset = 0
+        with open(self._store_path, "rb") as f:
+            for raw in f:
+                line = raw.rstrip(b"\r\n").rstrip(b",")
+                if line.startswith(b'"'):
+                    pid = json.loads(line[: line.index(b":")])
+                    m = STORE_HASH_REGEX.search(line)
+                    self.hashes[pid] = m.group(1).decode() if m else ""
+                    self._offsets[pid] = (offset, len(line))
+                offset += len(raw)
+        self.kind = "store"
+
+    def item(self, pid: str) -> dict:
+        if pid in self._items:
+            return self._items[pid]
+        offset, length = self._offsets[pid]
+        with open(self._store_path, "rb") as f:
+            f.seek(offset)
+            line = f.read(length).decode("utf-8")
+        return json.loads(line.split(": ", 1)[1])["item"]
+
+
+def item_field_value(item: dict, field: str):
+    """按 `item_diff_fields` 的字段名取值（`info.<键>` 取 `info` 内的字段）。"""
+    if field.startswith("info."):
+        return (item.get("info") or {}).get(field[len("info."):])
+    return item.get(field)
+
+
+def diff_runs(
+    base_dir: str,
+    out_dir: str = "etmoc_output",
+    source: str = "catalog",
+    feed_path: str | None = None,
+) -> dict:
+    """比较两次运行（`base_dir` 为旧，`out_dir` 为新）的输出，按产品 Id 生成变更流（不访问网络）：
+    - 只比较条目哈希，哈希不同的记录才读取并逐字段比较，代价随变化条数而非目录规模增长；
+    - 变更流写入 `feed_path`（默认 `out/changes.jsonl`），每行一条：
+      `added`（含完整条目）、`removed`（Id/URL/标题）、`changed`（`fields` 为 字段 → [旧值, 新值]，`info` 内的字段记为 `info.<键>`）；
+    - 仅本地图片路径不同的记录不计为变化。
+    返回计数字典。
+    """
+    feed_path = feed_path or os.path.join(out_dir, CHANGES_FILE)
+    summary = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+    base = RunSnapshot.open(base_dir, source)
+    cur = RunSnapshot.open(out_dir, source)
+    if base is None or cur is None:
+        return summary
+    tmp = feed_path + ".tmp"
+    with JsonlSink(tmp, stage="write_changes") as sink:
+        for pid, h in cur.hashes.items():
+            old_hash = base.hashes.get(pid)
+            if old_hash == h:
+                summary["unchanged"] += 1
+                continue
+            new = cur.item(pid)
+            if old_hash is None:
+                sink.write({"op": "added", "id": pid, "url": new.get("url"), "item": new})
+                summary["added"] += 1
+                continue
+            old = base.item(pid)
+            fields = item_diff_fields(old, new)
+            if not fields:
+                summary["unchanged"] += 1
+                continue
+            sink.write(
+                {
+                    "op": "changed",
+                    "id": pid,
+                    "url": new.get("url"),
+                    "title": new.get("title"),
+                    "fields": {
+                        k: [item_field_value(old, k), item_field_value(new, k)] for k in fields
+                    },
+                }
+            )
+            summary["changed"] += 1
+        for pid in base.hashes:
+            if pid not in cur.hashes:
+                old = base.item(pid)
+                sink.write({"op": "removed", "id": pid, "url": old.get("url"), "title": old.get("title")})
+                summary["removed"] += 1
+    os.replace(tmp, feed_path)
+    print(
+        f"运行差异（{base.kind} → {cur.kind}）：新增 {summary['added']}，删除 {summary['removed']}，"
+        f"变化 {summary['changed']}，未变 {summary['unchanged']}；变更流 {feed_path}"
+    )
+    return summary
+
+
+class DetailJournal:
+    """详情抓取的预写日志（`out/.run/detail_journal.jsonl`，含条目副本，不随输出提交），使中断的抓取可以续跑：
+    - 首行记录本次要抓取的全部详情链接；此后每个详情页完成即追加 `done`（含条目与页面指纹）或 `failed`（含错误）记录，
+      按批 fsync（同 `JsonlSink`），崩溃时最多丢失最后未同步的一批。
+    - 正常结束时追加 `complete`；未完成的日志可由 `--resume` 续跑：跳过已完成的链接，重试失败的链接。
+    """
+
+    FILE_NAME = "detail_journal.jsonl"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.links: list[str] = []
+        self.done: dict[str, dict] = {}
+        self.failed: dict[str, str] = {}
+        self.complete = False
+        self._sink: JsonlSink | None = None
+
+    @classmethod
+    def load(cls, out_dir: str) -> "DetailJournal":
+        journal = cls(run_path(out_dir, cls.FILE_NAME))
+        for rec in iter_jsonl(journal.path):
+            kind, url = rec.get("type"), rec.get("url")
+            if kind == "links":
+                journal.links = list(rec.get("links") or [])
+            elif kind == "done" and url:
+                journal.done[url] = rec
+                journal.failed.pop(url, None)
+            elif kind == "failed" and url and url not in journal.done:
+                journal.failed[url] = rec.get("error", "")
+            elif kind == "complete":
+                journal.complete = True
+        return journal
+
+    @property
+    def resumable(self) -> bool:
+        return bool(self.links) and not self.complete
+
+    def pending(self) -> list[str]:
+        """尚未完成的链接（含上次失败的），保持原顺序。"""
+        return [u for u in self.links if u not in self.done]
+
+    def start(self, links: list[str]):
+        """开始新一轮抓取：清空旧日志并立即落盘链接清单。"""
+        self.links, self.done, self.failed, self.complete = list(links), {}, {}, False
+        self._sink = JsonlSink(self.path, stage="write_journal")
+        self._sink.write({"type": "links", "links": self.links})
+        self._sink.sync()
+
+    def reopen(self):
+        """续跑：截掉崩溃时残留的半行，在原日志后追加。"""
+        truncate_partial_line(self.path)
+        self._sink = JsonlSink(self.path, append=True, stage="write_journal")
+
+    def record_done(self, url: str, item: dict, fingerprint: str | None = None):
+        rec = {"type": "done", "url": url, "fingerprint": fingerprint, "item": item}
+        self._sink.write(rec)
+        self.done[url] = rec
+        self.failed.pop(url, None)
+
+    def record_failed(self, url: str, error: Exception | str):
+        self._sink.write({"type": "failed", "url": url, "error": str(error)})
+        self.failed[url] = str(error)
+
+    def finish(self):
+        self._sink.write({"type": "complete"})
+        self.complete = True
+        self.close()
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
 
 
 def crawl_catalog_with_playwright(
@@ -639,56 +4237,181 @@ def crawl_catalog_with_playwright(
     pages_limit: int = 0,
     start_page: int | str | None = None,
     incremental: bool = False,
+    workers: int = 1,
+    fetch_mode: str = "browser",
+    image_concurrency: int = 8,
+    stop_after_known: int = 0,
+    min_rate: float = 0.0,
+    max_rate: float = 0.0,
+    sqlite: bool = False,
+    archive: bool = False,
+    parse_workers: int = 0,
+    parse_queue: int = 16,
+    resume: bool = False,
 ):
     """目录源：先收集产品链接，再解析详情并下载图片。
     参数：同 `collect_catalog_links` 的分页/起始/增量语义；另含 `limit/delay/out_dir`。
+    - workers：详情并发数；>1 时由 `iter_products_with_pool` 并发解析（每个 worker 一个浏览器），输出顺序不变。
+    - fetch_mode：`browser`（默认，全部用 Chromium 渲染）或 `http`（校验后经 requests 会话拉取，失败回退浏览器）。
+    - image_concurrency：末尾批量下载图片的并发数。
+    - stop_after_known：增量模式下连续 K 个目录页没有产品库外的新 Id 即停止翻页（见 `collect_catalog_links`）。
+    - min_rate/max_rate：自适应限速的速率上下限（次/秒）；0 表示按 `delay` 推导（见 `RateController.configure`）。
+    - sqlite：同时由产品库导出 `out/products_catalog.db`（见 `SqliteSink`）。
+    - archive：把详情页原始 HTML 压缩存入 `out/.run/html_archive.db`（见 `HtmlArchive`），供 `reparse_archive` 离线重建。
+    - parse_workers：详情 HTML 的解析进程数（见 `ParsePipeline`），抓取线程提交后即去抓下一页；0（默认）表示在抓取线程内直接解析。
+    - parse_queue：等待解析的页面上限，解析跟不上时阻塞抓取（背压）。
+    - resume：`out/.run/detail_journal.jsonl`（见 `DetailJournal`）未完成时续跑：不清理输出目录、不重新收集链接，
+      已完成的条目从日志回放，只抓取剩余与上次失败的详情页；图片下载跳过已存在的文件。日志不存在或已完成时按正常流程运行。
     行为：
     - 链接收集后使用进度条解析详情；统一在末尾下载第一张图片以避免阻塞。
     - 非增量模式清理输出目录；增量模式仅确保目录存在。
+    - 每条详情解析后立即追加到 `out/.run/products_catalog.jsonl`（本次运行流水，不提交）。
+    - 同时按产品 Id upsert 到 `ProductStore`；增量模式保留以往条目，页面指纹未变的详情页不再解析。
+    - JSON/CSV 由产品库导出；库无改动且导出文件已存在时不重写。
     输出：
-    - `out/products_catalog.json`、`out/products_catalog.csv`，图片保存在 `out/images/`。
+    - `out/.run/products_catalog.jsonl`、`out/product_store.json`、`out/products_catalog.json`、`out/products_catalog.csv`，
+      图片保存在 `out/images/`。
     """
-    if incremental:
+    RATE.configure(delay, min_rate, max_rate)
+    PAGELOAD.reset()
+    RECYCLES.reset()
+    READINESS.reset()
+    METRICS.reset("catalog")
+    journal = DetailJournal.load(out_dir) if resume else None
+    resuming = bool(journal and journal.resumable)
+    if resume and not resuming:
+        print("没有未完成的详情日志，按正常流程抓取。")
+    if incremental or resuming:
         os.makedirs(out_dir, exist_ok=True)
         os.makedirs(os.path.join(out_dir, "images"), exist_ok=True)
     else:
         ensure_clean_out(out_dir)
-    products = []
+    if not resuming:
+        journal = DetailJournal(run_path(out_dir, DetailJournal.FILE_NAME))
+    METRICS.start_flusher(out_dir, METRICS_CONFIG["interval"])
+    jsonl_path = run_path(out_dir, "products_catalog.jsonl")
+    json_path = os.path.join(out_dir, "products_catalog.json")
+    store = ProductStore.load(out_dir, seed_json=json_path)
+    sink = JsonlSink(jsonl_path)
+    html_archive = HtmlArchive(run_path(out_dir, HtmlArchive.FILE_NAME)) if archive else None
+    t_start = time.monotonic()
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=HEADERS["User-Agent"])
-        page = context.new_page()
-        page.set_default_navigation_timeout(45000)
-        page.set_default_timeout(45000)
+        _, page, reused = open_verified_context(browser)
+        # 校验（或复用状态）完成后再同步 cookie 给 HTTP 会话
         session = requests.Session()
         session.headers.update(HEADERS)
-        cookies_to_requests(session, context.cookies())
-        links = collect_catalog_links(
-            page,
-            pages_limit=pages_limit,
-            delay=delay,
-            limit=limit,
-            start_page=start_page,
-            incremental=incremental,
-            out_dir=out_dir,
-        )
-        print(f"目录页链接合计：{len(links)}")
-        pb = tqdm(total=len(links), desc="详情解析", unit="项", dynamic_ncols=True)
-        for i, link in enumerate(links, 1):
-            try:
-                item = parse_product_item(page, session, link, out_dir, delay)
-                products.append(item)
-                tqdm.write(f"[{i}/{len(links)}] 已解析：{item.get('title', '')}")
+        cookies_to_requests(session, page.context.cookies())
+        if resuming:
+            links = journal.links
+            # 回放已完成的条目：与未中断时一样写入本次流水并 upsert 到产品库
+            for u in links:
+                rec = journal.done.get(u)
+                if rec is not None:
+                    store.upsert(u, rec["item"], rec.get("fingerprint"))
+                    sink.write(rec["item"])
+            journal.reopen()
+            todo = journal.pending()
+            print(
+                f"续跑详情抓取：链接 {len(links)}，已完成 {len(journal.done)}，"
+                f"上次失败 {len(journal.failed)}（将重试），待抓取 {len(todo)}"
+            )
+        else:
+            links = collect_catalog_links(
+                page,
+                pages_limit=pages_limit,
+                limit=limit,
+                start_page=start_page,
+                incremental=incremental,
+                out_dir=out_dir,
+                session=session,
+                fetch_mode=fetch_mode,
+                known_ids=set(store.records),
+                stop_after_known=stop_after_known,
+                workers=workers,
+            )
+            print(f"目录页链接合计：{len(links)}")
+            journal.start(links)
+            todo = links
+        # 目录翻页期间可能重新校验过，刷新会话 cookie（图片下载与 HTTP 快速通道共用）
+        cookies_to_requests(session, page.context.cookies())
+        pb = tqdm(total=len(todo), desc="详情解析", unit="项", dynamic_ncols=True)
+        pipeline = ParsePipeline(parse_workers, parse_queue) if parse_workers > 0 else None
+        browser_open = True
+        if workers and workers > 1 and len(todo) > 1:
+            # worker 各自持有浏览器（同步 API 的页面不能跨线程），详情阶段不再需要主浏览器：
+            # 先取会话状态再关闭它，`--workers N` 时同时运行的是 N 个而不是 N+1 个 Chromium
+            state = page.context.storage_state()
+            browser.close()
+            browser_open = False
+            results = iter_products_with_pool(
+                todo,
+                state,
+                out_dir,
+                workers=workers,
+                fetch_mode=fetch_mode,
+                store=store,
+                archive=html_archive,
+                pipeline=pipeline,
+            )
+        elif pipeline is not None:
+            results = iter_products_pipelined(
+                page, session, todo, out_dir, pipeline, fetch_mode, store, html_archive
+            )
+        else:
+            results = iter_products_inline(page, session, todo, out_dir, fetch_mode, store, html_archive)
+        parsed = 0
+        try:
+            for idx, link, item, err in results:
+                if err is not None:
+                    journal.record_failed(link, err)
+                    print(f"详情解析失败: {link} -> {err}")
+                    continue
+                sink.write(item)
+                journal.record_done(link, item, store.fingerprint(link))
+                parsed += 1
+                if parsed == 1:
+                    report_first_product(t_start, reused)
+                tqdm.write(f"[{idx + 1}/{len(todo)}] 已解析：{item.get('title', '')}")
                 pb.update(1)
-            except Exception as e:
-                print(f"详情解析失败: {link} -> {e}")
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+            journal.close()
         pb.close()
+        if fetch_mode == "http":
+            print(
+                f"HTTP 快速通道：命中 {FETCH_STATS['http']} 次，回退浏览器 {FETCH_STATS['browser_fallback']} 次"
+            )
+        sink.close()
+        if html_archive is not None:
+            html_archive.close()
+            print(f"原始 HTML 归档：本次写入 {html_archive.count} 页")
         # 统一下载图片，避免解析阶段的网络阻塞
-        download_images_for_items(products, session, out_dir)
-        browser.close()
-    save_json(products, os.path.join(out_dir, "products_catalog.json"))
-    save_csv(products, os.path.join(out_dir, "products_catalog.csv"))
-    print(f"完成目录抓取：{len(products)} 条，输出目录：{out_dir}")
+        image_map = download_images(
+            first_image_urls(iter_jsonl(jsonl_path)),
+            session,
+            out_dir,
+            concurrency=image_concurrency,
+        )
+        if browser_open:
+            browser.close()
+    store.merge_order([product_id_from_url(u) for u in links])
+    store.apply_image_map(image_map)
+    export_store(store, out_dir, sqlite)
+    if journal.failed:
+        # 留下未完成的日志，`--resume` 只重试失败的链接
+        print(f"详情失败 {len(journal.failed)} 条，可用 --resume 重试。")
+    else:
+        journal.reopen()
+        journal.finish()
+    update_shard_manifest(out_dir, items=len(store), finished=not journal.failed)
+    RATE.report()
+    PAGELOAD.report(out_dir)
+    RECYCLES.report(out_dir)
+    READINESS.report(out_dir)
+    METRICS.report(out_dir)
+    print(f"完成目录抓取：本次 {sink.count} 条，输出目录：{out_dir}")
 
 
 def crawl_catalog_links(
@@ -698,6 +4421,11 @@ def crawl_catalog_links(
     delay: float = 0.7,
     start_page: int | str | None = None,
     incremental: bool = False,
+    fetch_mode: str = "browser",
+    stop_after_known: int = 0,
+    workers: int = 1,
+    min_rate: float = 0.0,
+    max_rate: float = 0.0,
 ):
     """仅收集目录页的产品链接（不解析详情），用于快速预览或链路检查。
     行为：
@@ -705,29 +4433,46 @@ def crawl_catalog_links(
     输出：
     - 写入 `out/product_links.json`，字段：`{"count": <数量>, "links": [绝对URL...]}`。
     """
+    RATE.configure(delay, min_rate, max_rate)
+    PAGELOAD.reset()
+    RECYCLES.reset()
+    READINESS.reset()
+    METRICS.reset("catalog")
     if incremental:
         os.makedirs(out_dir, exist_ok=True)
         os.makedirs(os.path.join(out_dir, "images"), exist_ok=True)
     else:
         ensure_clean_out(out_dir)
+    METRICS.start_flusher(out_dir, METRICS_CONFIG["interval"])
+    known_ids = load_known_product_ids(out_dir) if incremental else set()
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=HEADERS["User-Agent"])
-        page = context.new_page()
-        page.set_default_navigation_timeout(45000)
-        page.set_default_timeout(45000)
+        _, page, _ = open_verified_context(browser)
+        session = None
+        if fetch_mode == "http":
+            session = requests.Session()
+            session.headers.update(HEADERS)
         links = collect_catalog_links(
             page,
             pages_limit=pages_limit,
-            delay=delay,
             limit=limit,
             start_page=start_page,
             incremental=incremental,
             out_dir=out_dir,
+            session=session,
+            fetch_mode=fetch_mode,
+            known_ids=known_ids,
+            stop_after_known=stop_after_known,
+            workers=workers,
         )
         browser.close()
     out = {"count": len(links), "links": links}
     save_json(out, os.path.join(out_dir, "product_links.json"))
+    RATE.report()
+    PAGELOAD.report(out_dir)
+    RECYCLES.report(out_dir)
+    READINESS.report(out_dir)
+    METRICS.report(out_dir)
     print(f"完成链接收集：{len(links)} 条，输出目录：{out_dir}")
 
 
@@ -738,7 +4483,24 @@ if __name__ == "__main__":
     ap.add_argument(
         "--limit", type=int, default=0, help="最多抓取的产品条数，0 表示不限"
     )
-    ap.add_argument("--delay", type=float, default=0.5, help="请求间隔秒数")
+    ap.add_argument(
+        "--delay",
+        type=float,
+        default=0.5,
+        help="初始请求间隔秒数（自适应限速的起点，实际速率随延迟与错误率调整）",
+    )
+    ap.add_argument(
+        "--min-rate",
+        type=float,
+        default=0.0,
+        help="自适应限速下限（次/秒），0 表示取初始速率的 1/10",
+    )
+    ap.add_argument(
+        "--max-rate",
+        type=float,
+        default=0.0,
+        help="自适应限速上限（次/秒），0 表示取初始速率的 4 倍",
+    )
     ap.add_argument("--out", type=str, default="etmoc_output", help="输出目录")
     ap.add_argument(
         "--pages",
@@ -757,17 +4519,216 @@ if __name__ == "__main__":
         action="store_true",
         help="启用增量模式（默认关注前几页；若需从检查点继续请配合 --start-page latest）",
     )
+    ap.add_argument(
+        "--stop-after-known",
+        type=int,
+        default=0,
+        help="增量模式下连续 K 个目录页没有新产品 Id 即停止翻页；0 表示不启用",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="并发 worker 数（详情抓取与数值分页分片），默认 1；整体请求速率仍受全局限速约束。"
+        "每个 worker 是独立线程与独立 Chromium（同步 API 的页面不能跨线程共用）：详情阶段先关闭主浏览器，共 N 个浏览器；"
+        "目录分片翻页时主浏览器仍在，共 N+1 个。内存按浏览器个数线性增长，单个浏览器的占用见 .run/recycle_log.json",
+    )
+    ap.add_argument(
+        "--fetch-mode",
+        type=str,
+        choices=list(FETCH_MODES),
+        default="browser",
+        help="页面获取方式：browser 全部用浏览器渲染；http 校验后经 HTTP 会话拉取，遇校验页/空页回退浏览器",
+    )
+    ap.add_argument(
+        "--brand-workers",
+        type=int,
+        default=None,
+        help="brands 源并发展开品牌页的线程数，发现的详情链接即时流入解析。"
+        "--fetch-mode browser 默认 1，即品牌页不并发，需显式传入 >1 才启用：Playwright 同步 API 的页面绑定线程，"
+        "每个线程各起一个独立 Chromium，N 个线程多占 N 个浏览器的内存；http 默认 4（主要走 HTTP，回退时才启动浏览器）",
+    )
+    ap.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="目录源详情 HTML 的解析进程数，>0 时抓取与解析流水线并行；默认 0，在抓取线程内解析"
+        "（单页解析为毫秒级，远小于页面导航，进程池只在 --fetch-mode http 等解析成为瓶颈时值得启用）",
+    )
+    ap.add_argument(
+        "--parse-queue",
+        type=int,
+        default=16,
+        help="等待解析的页面上限，解析跟不上时阻塞抓取，默认 16",
+    )
+    ap.add_argument(
+        "--image-concurrency",
+        type=int,
+        default=8,
+        help="末尾批量下载图片的并发数，默认 8",
+    )
+    ap.add_argument(
+        "--revalidate-images",
+        action="store_true",
+        help="对已下载的图片按清单中的 ETag/Last-Modified 发条件请求（304 即保留）；默认已有图片不再请求",
+    )
+    ap.add_argument(
+        "--no-block-resources",
+        action="store_true",
+        help="关闭请求拦截层（默认屏蔽样式/字体/媒体/图片与统计脚本）",
+    )
+    ap.add_argument(
+        "--block-types",
+        type=str,
+        default=None,
+        help="拦截的资源类型，逗号分隔；默认 stylesheet,font,media,image",
+    )
+    ap.add_argument(
+        "--block-url",
+        action="append",
+        default=[],
+        help="额外拦截的 URL 正则，可重复指定",
+    )
+    ap.add_argument(
+        "--capture-images",
+        action="store_true",
+        help="详情页放行产品图片并直接保存其字节，末尾不再重复下载",
+    )
+    ap.add_argument(
+        "--recycle-after",
+        type=int,
+        default=0,
+        help="同一浏览器上下文导航 N 次后回收，cookie 随之带入新上下文；0 表示不回收",
+    )
+    ap.add_argument(
+        "--rss-ceiling",
+        type=float,
+        default=0,
+        help="页面所属浏览器的进程树常驻内存超过该值（MiB）时回收上下文；0 表示不检查",
+    )
+    ap.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=0,
+        help="每隔 N 秒刷新一次 metrics.json 与 Prometheus 文本文件；0 表示仅在结束时写出",
+    )
+    ap.add_argument(
+        "--metrics-textfile",
+        type=str,
+        default=None,
+        help="Prometheus 文本文件路径（如 node_exporter textfile 目录下的 etmoc.prom），默认 <out>/.run/metrics.prom",
+    )
+    ap.add_argument(
+        "--state-file",
+        type=str,
+        default=SESSION_CONFIG["state_path"],
+        help="校验后会话状态（cookie 等）的保存路径，跨运行复用；默认 .etmoc_state/browser_state.json",
+    )
+    ap.add_argument(
+        "--fresh-session",
+        action="store_true",
+        help="忽略已保存的会话状态，启动时重新校验（成功后覆盖保存）",
+    )
+    ap.add_argument(
+        "--parser",
+        type=str,
+        choices=list(PARSER_BACKENDS),
+        default="auto",
+        help="HTML 解析后端：auto（有 lxml 用 lxml，否则 html.parser）、lxml、html.parser",
+    )
+    ap.add_argument(
+        "--full-parse",
+        action="store_true",
+        help="关闭局部解析（SoupStrainer），始终整页构建 DOM",
+    )
+    ap.add_argument(
+        "--sqlite",
+        action="store_true",
+        help="额外导出 SQLite 数据库（<out>/products_catalog.db 或 products_playwright.db），供 --action query 查询",
+    )
+    ap.add_argument(
+        "--columnar",
+        type=str,
+        choices=list(COLUMNAR_FORMATS),
+        default=None,
+        help="额外导出类型化列式文件（<out>/products_catalog.parquet 或 .arrow）；需安装 pyarrow",
+    )
     ap.add_argument(
         "--source", type=str, choices=["catalog", "brands"], default="catalog"
     )
     ap.add_argument(
         "--action",
         type=str,
-        choices=["list", "detail"],
+        choices=["list", "detail", "query", "reparse", "merge", "diff"],
         default="detail",
-        help="catalog 源的动作：list 仅收集链接，detail 解析详情",
+        help="动作：list 仅收集链接，detail 解析详情（均为 catalog 源）；query 查询已导出的 SQLite 数据库；"
+        "reparse 从原始 HTML 归档离线重建目录输出；merge 合并 <out>/shard-i-of-N 分片输出；"
+        "diff 比较 --base 与 --out 两次运行并输出变更流",
+    )
+    ap.add_argument(
+        "--base",
+        type=str,
+        default=None,
+        help="diff：作为比较基准的旧运行输出目录",
+    )
+    ap.add_argument(
+        "--feed",
+        type=str,
+        default=None,
+        help="diff：变更流 JSONL 路径，默认 <out>/changes.jsonl",
     )
+    ap.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        help="多节点分片 i/N（1 ≤ i ≤ N）：catalog 源按总页数切连续页段，brands 源按产品 Id 哈希；"
+        "输出写入 <out>/shard-i-of-N/",
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="catalog 详情抓取中断后续跑：按 <out>/.run/detail_journal.jsonl 跳过已完成的详情页、重试失败的",
+    )
+    ap.add_argument(
+        "--archive",
+        action="store_true",
+        help="详情抓取时把原始 HTML 压缩存入 <out>/.run/html_archive.db（不随输出提交），供 --action reparse 使用",
+    )
+    ap.add_argument(
+        "--db", type=str, default=None, help="query 使用的数据库路径，默认按 --source 取输出目录下的 .db"
+    )
+    ap.add_argument("--id", type=str, default=None, help="query：产品 Id")
+    ap.add_argument("--barcode", type=str, default=None, help="query：小盒或条盒条码")
+    ap.add_argument("--name", type=str, default=None, help="query：中文或英文品名前缀")
+    ap.add_argument("--released", type=str, default=None, help="query：上市时间前缀，如 2025")
+    ap.add_argument("--max-rows", type=int, default=0, help="query：最多返回的条数，0 表示不限")
     args = ap.parse_args()
+    PARSER["backend"] = args.parser
+    PARSER["scoped"] = not args.full_parse
+    ROUTE_CONFIG["enabled"] = not args.no_block_resources
+    if args.block_types is not None:
+        ROUTE_CONFIG["resource_types"] = {
+            t.strip() for t in args.block_types.split(",") if t.strip()
+        }
+    ROUTE_CONFIG["url_patterns"] = ROUTE_CONFIG["url_patterns"] + args.block_url
+    ROUTE_CONFIG["capture_images"] = args.capture_images
+    IMAGE_CONFIG["revalidate"] = args.revalidate_images
+    EXPORT_CONFIG["columnar"] = args.columnar
+    SESSION_CONFIG["state_path"] = args.state_file
+    SESSION_CONFIG["reuse"] = not args.fresh_session
+    METRICS_CONFIG["interval"] = args.metrics_interval
+    RECYCLE_CONFIG["navigations"] = max(0, args.recycle_after)
+    RECYCLE_CONFIG["rss_mb"] = max(0.0, args.rss_ceiling)
+    METRICS_CONFIG["textfile"] = args.metrics_textfile
+    if args.action == "diff" and not args.base:
+        ap.error("--action diff 需要 --base 指定旧运行的输出目录")
+    if args.shard and args.action in ("list", "detail"):
+        try:
+            SHARD_CONFIG["index"], SHARD_CONFIG["count"] = parse_shard_spec(args.shard)
+        except ValueError as e:
+            ap.error(str(e))
+        if is_sharded():
+            args.out = os.path.join(args.out, shard_dir_name(SHARD_CONFIG["index"], SHARD_CONFIG["count"]))
 
     # 计算分页上限：`--pages` 优先；支持整数或 `all`；默认 1 页。`all` 仍受站点总页数边界约束。
     if args.pages is None:
@@ -783,7 +4744,37 @@ if __name__ == "__main__":
                 print("参数错误: --pages 需为整数或 all；使用默认 1 页")
                 pages_limit = 1
 
-    if args.source == "catalog":
+    if args.action == "query":
+        stem = "products_catalog" if args.source == "catalog" else "products_playwright"
+        db_path = args.db or os.path.join(args.out, f"{stem}.db")
+        if not os.path.exists(db_path):
+            print(f"数据库不存在：{db_path}（先以 --sqlite 运行抓取）")
+        else:
+            t0 = time.perf_counter()
+            found = query_sqlite(
+                db_path,
+                product_id=args.id,
+                barcode=args.barcode,
+                name=args.name,
+                released=args.released,
+                limit=args.max_rows,
+            )
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            for it in found:
+                print(json.dumps(it, ensure_ascii=False))
+            print(f"命中 {len(found)} 条，查询耗时 {elapsed_ms:.1f} ms")
+    elif args.action == "reparse":
+        # --workers 未显式增大时使用全部 CPU 核
+        reparse_archive(
+            out_dir=args.out,
+            workers=args.workers if args.workers > 1 else 0,
+            sqlite=args.sqlite,
+        )
+    elif args.action == "merge":
+        merge_shards(out_dir=args.out, source=args.source, sqlite=args.sqlite)
+    elif args.action == "diff":
+        diff_runs(base_dir=args.base, out_dir=args.out, source=args.source, feed_path=args.feed)
+    elif args.source == "catalog":
         if args.action == "list":
             crawl_catalog_links(
                 out_dir=args.out,
@@ -792,6 +4783,11 @@ if __name__ == "__main__":
                 delay=args.delay,
                 start_page=args.start_page,
                 incremental=args.incremental,
+                fetch_mode=args.fetch_mode,
+                stop_after_known=args.stop_after_known,
+                workers=args.workers,
+                min_rate=args.min_rate,
+                max_rate=args.max_rate,
             )
         else:
             crawl_catalog_with_playwright(
@@ -801,9 +4797,28 @@ if __name__ == "__main__":
                 pages_limit=pages_limit,
                 start_page=args.start_page,
                 incremental=args.incremental,
+                workers=args.workers,
+                fetch_mode=args.fetch_mode,
+                image_concurrency=args.image_concurrency,
+                stop_after_known=args.stop_after_known,
+                min_rate=args.min_rate,
+                max_rate=args.max_rate,
+                sqlite=args.sqlite,
+                archive=args.archive,
+                parse_workers=args.parse_workers,
+                parse_queue=args.parse_queue,
+                resume=args.resume,
             )
     else:
         crawl_with_playwright(
-            limit=args.limit or None, delay=args.delay, out_dir=args.out
+            limit=args.limit or None,
+            delay=args.delay,
+            out_dir=args.out,
+            fetch_mode=args.fetch_mode,
+            image_concurrency=args.image_concurrency,
+            min_rate=args.min_rate,
+            max_rate=args.max_rate,
+            sqlite=args.sqlite,
+            brand_workers=args.brand_workers,
         )
 
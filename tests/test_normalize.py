@@ -0,0 +1,168 @@
+"""类型化规范（`normalize_item` 及其解析函数）的回归测试。
+
+样例取自提交的 `etmoc_output/products_catalog.json` 的真实条目（含校验位错误的条码、雪茄规格、
+无条盒数量与批发价等形态），以及各解析函数的边界输入；期望值只列出需要固定的字段，值与类型都须一致。
+"""
+
+from decimal import Decimal
+
+import pytest
+
+import playwright_scrape_etmoc as etmoc
+
+NORMALIZE_CASES = [
+    (
+        {
+            "url": "http://www.etmoc.com/Firms/Product?Id=3576",
+            "title": "真龙（冰净） Zhenlong Ice Clean",
+            "info": {
+                "中文品名": "真龙（冰净）",
+                "产品类型": "烤烟型",
+                "焦油量": "5mg",
+                "烟碱量": "0.5mg",
+                "一氧化碳量": "4mg",
+                "包装形式": "条盒硬盒 （每盒 20 支，每条 10 盒）",
+                "烟支规格": "97mm 细支 爆珠",
+                "小盒条码": "6901028214216",
+                "条盒条码": "6901028214223",
+                "小盒零售价": "26 元/盒",
+                "条盒零售价": "260 元/条",
+                "上市时间": "2025 年",
+            },
+        },
+        {
+            "id": 3576,
+            "tar_mg": 5.0,
+            "nicotine_mg": 0.5,
+            "co_mg": 4.0,
+            "package": "条盒硬盒",
+            "sticks_per_pack": 20,
+            "packs_per_carton": 10,
+            "stick_length_mm": 97.0,
+            "stick_gauge": "细支",
+            "capsule": True,
+            "pack_barcode": "6901028214216",
+            "pack_barcode_valid": True,
+            "carton_barcode_valid": True,
+            "pack_price_yuan": Decimal("26.00"),
+            "carton_price_yuan": Decimal("260.00"),
+            "release_date": "2025",
+            "release_year": 2025,
+        },
+    ),
+    (
+        {
+            "url": "http://www.etmoc.com/Firms/Product?Id=3488",
+            "info": {
+                "烟支规格": "94mm 中支 爆珠",
+                "小盒条码": "6901028230179",
+                "批发价格": "201.4元/条",
+                "上市时间": "2024 年",
+            },
+        },
+        {
+            "id": 3488,
+            "stick_gauge": "中支",
+            "pack_barcode_valid": True,
+            "carton_barcode": None,
+            "carton_barcode_valid": None,
+            "wholesale_price_yuan": Decimal("201.40"),
+            "wholesale_unit": "条",
+            "pack_price_yuan": None,
+        },
+    ),
+    (
+        {
+            "url": "http://www.etmoc.com/Firms/Product?Id=3551",
+            "info": {
+                "产品类型": "手工雪茄",
+                "焦油量": "中",
+                "包装形式": "条盒硬盒 （每盒 4 支，每条 6 盒）",
+                "烟支规格": "长度 90mm，直径 15.9mm，圆周 50mm",
+                "小盒条码": "6901028258944",
+                "批发价格": "640元/条",
+            },
+        },
+        {
+            "tar_mg": None,
+            "sticks_per_pack": 4,
+            "packs_per_carton": 6,
+            "stick_length_mm": 90.0,
+            "stick_diameter_mm": 15.9,
+            "stick_circumference_mm": 50.0,
+            "stick_gauge": None,
+            "capsule": False,
+            "pack_barcode_valid": True,
+        },
+    ),
+    (
+        # 站点录入的小盒条码多了一位：原文保留，校验不通过
+        {
+            "url": "http://www.etmoc.com/Firms/Product?Id=3568",
+            "info": {
+                "小盒条码": "69010280212663",
+                "条盒条码": "6901028212670",
+                "小盒零售价": "100 元/盒",
+            },
+        },
+        {
+            "pack_barcode": "69010280212663",
+            "pack_barcode_valid": False,
+            "carton_barcode_valid": True,
+            "pack_price_yuan": Decimal("100.00"),
+        },
+    ),
+    (
+        {
+            "url": "http://www.etmoc.com/Firms/Product?Id=447",
+            "info": {
+                "包装形式": "纸盒 （每盒 5 支）",
+                "烟支规格": "长度 132mm，直径 13.8mm，圆周 43.4mm",
+                "小盒条码": "6901028185 042",
+            },
+        },
+        {
+            "package": "纸盒",
+            "sticks_per_pack": 5,
+            "packs_per_carton": None,
+            "stick_length_mm": 132.0,
+            "stick_circumference_mm": 43.4,
+            "pack_barcode": "6901028185042",
+            "pack_barcode_valid": True,
+            "release_date": None,
+        },
+    ),
+]
+FIELD_CASES = [
+    (etmoc.gtin_valid, "96385074", True),  # EAN-8
+    (etmoc.gtin_valid, "036000291452", True),  # UPC-A
+    (etmoc.gtin_valid, "6901028214217", False),
+    (etmoc.gtin_valid, "036000291453", False),
+    (etmoc.gtin_valid, "69010282142a6", False),
+    (etmoc.parse_yuan, "560元/条（10支）", (Decimal("560.00"), "条")),
+    (etmoc.parse_yuan, "12.5 元 / 每支", (Decimal("12.50"), "支")),
+    (etmoc.parse_yuan, "暂无", (None, None)),
+    (etmoc.parse_iso_date, "2017 年 5 月 3 日", ("2017-05-03", 2017)),
+    (etmoc.parse_iso_date, "2009 年 13 月", ("2009", 2009)),
+    (etmoc.parse_mg, "0.8mg", 0.8),
+    (etmoc.parse_mg, "中", None),
+]
+
+
+
+@pytest.mark.parametrize(
+    "item, expected", NORMALIZE_CASES, ids=[item["url"].rsplit("=", 1)[1] for item, _ in NORMALIZE_CASES]
+)
+def test_normalize_item(item, expected):
+    rec = etmoc.normalize_item(item)
+    assert set(rec) == {name for name, _ in etmoc.TYPED_COLUMNS}
+    for key, want in expected.items():
+        assert rec[key] == want, key
+        assert type(rec[key]) is type(want), key
+
+
+@pytest.mark.parametrize(
+    "fn, arg, want", FIELD_CASES, ids=[f"{fn.__name__}-{arg}" for fn, arg, _ in FIELD_CASES]
+)
+def test_field_parsers(fn, arg, want):
+    assert fn(arg) == want